@@ -41,12 +41,18 @@ from .ui import *
 from .buttons import *
 from .functions.common import *
 from .functions.prop_update_utils import *
+from .functions.presets import getRigPresetItems
+from .functions.rig_registry import *
+from .functions.useractions import *
+from .functions.bounds_cache import *
 
 classes = (
     SCENE_PT_default_scene,
     SCENE_OT_setup_default_scene,
     SCENE_OT_delete_default_scene,
     SCENE_OT_position_default_camera,
+    SCENE_OT_frame_default_camera,
+    SCENE_OT_save_rig_library,
 )
 
 
@@ -70,21 +76,109 @@ def register():
     bpy.types.Scene.hdri_resolution = EnumProperty(
         name="HDRI Resolution",
         description="Resolution of the HDRI Environment map (1k-16k)",
+        # new items go last, files store enum values by position
         items=(("1k", "1k", "Use HDRI map at this resolution"),
                ("2k", "2k", "Use HDRI map at this resolution"),
                ("4k", "4k", "Use HDRI map at this resolution"),
                ("8k", "8k", "Use HDRI map at this resolution"),
-               ("16k","16k","Use HDRI map at this resolution")),
-        update=loadHDRI,
+               ("16k","16k","Use HDRI map at this resolution"),
+               ("AUTO", "Auto", "Use smallest HDRI map (up to 8k) matching the texel density seen through the camera at render resolution")),
+        update=updateHDRIResolution,
         default="8k")
+    # rig presets only change the HDRI resolution while this is off
+    bpy.types.Scene.ds_hdri_resolution_user_set = BoolProperty(default=False)
+    bpy.types.Scene.ds_progressive_hdri = BoolProperty(
+        name="Progressive HDRI Loading",
+        description="Show the 1k HDRI map right away and swap in the selected resolution once it has been loaded",
+        default=True)
+    bpy.types.Scene.ds_hdri_filter = EnumProperty(
+        name="HDRI Filter",
+        description="Filter used to generate lower HDRI resolutions from the largest map in the textures folder",
+        items=(("BOX", "Box", "Average 2x2 texel blocks (fast)"),
+               ("LANCZOS", "Lanczos", "Lanczos-3 filter (sharper)")),
+        update=loadHDRI,
+        default="BOX")
+    bpy.types.Scene.ds_hdri_memory_budget = IntProperty(
+        name="HDRI Memory Budget",
+        description="Maximum memory (in MB) for HDRI pixels loaded by this addon; least recently used maps are freed first",
+        subtype="UNSIGNED",
+        min=0,
+        update=loadHDRI,
+        default=2048)
+    bpy.types.Scene.ds_rig_preset = EnumProperty(
+        name="Rig Preset",
+        description="Lighting rig preset (from the addon's 'presets' folder) used by scene setup",
+        items=getRigPresetItems)
+    bpy.types.Scene.ds_rig_source = EnumProperty(
+        name="Rig Source",
+        description="How scene setup creates the lights and world",
+        items=(("BUILD", "Build", "Construct lights and world node tree from the rig preset"),
+               ("APPEND", "Append", "Append lights and world from the bundled rig library (.blend)"),
+               ("LINK", "Link", "Link lights and world from the bundled rig library so scenes share one set of datablocks")),
+        default="BUILD")
+    bpy.types.Scene.ds_frame_fraction = FloatProperty(
+        name="Frame Fill",
+        description="Fraction of the frame the subject fills when framing the camera",
+        subtype="FACTOR",
+        min=0.05, max=1,
+        default=0.8)
+    bpy.types.Scene.ds_navigation_quality = BoolProperty(
+        name="Fast Camera Positioning",
+        description="Lower viewport samples, enable viewport denoising and use the 1k HDRI map while the camera is being positioned",
+        default=True)
+    bpy.types.Scene.ds_navigation_samples = IntProperty(
+        name="Positioning Samples",
+        description="Maximum viewport samples while the camera is being positioned",
+        min=1, soft_max=64,
+        default=4)
     bpy.types.Scene.ds_scene_created = BoolProperty(default=False)
+    bpy.types.Scene.ds_rig_id = StringProperty(default="")
+
+    subscribeAutoHDRI()
+    bpy.app.handlers.load_post.append(handle_subscribe_auto_hdri)
+    bpy.app.handlers.load_post.append(handle_reload_decoded_hdris)
+    bpy.app.handlers.load_post.append(handle_reset_rig_registry)
+    bpy.app.handlers.undo_post.append(handle_reset_rig_registry)
+    bpy.app.handlers.redo_post.append(handle_reset_rig_registry)
+    getRegistryUpdateHandlers().append(handle_invalidate_rig_registry)
+    subscribe_keymap_cache()
+    bpy.app.handlers.load_post.append(handle_subscribe_keymap_cache)
+    getRegistryUpdateHandlers().append(handle_bounds_geometry_update)
+    bpy.app.handlers.load_post.append(handle_reset_bounds_cache)
+    bpy.app.handlers.undo_post.append(handle_reset_bounds_cache)
+    bpy.app.handlers.redo_post.append(handle_reset_bounds_cache)
 
 def unregister():
     Scn = bpy.types.Scene
 
+    bpy.app.handlers.redo_post.remove(handle_reset_bounds_cache)
+    bpy.app.handlers.undo_post.remove(handle_reset_bounds_cache)
+    bpy.app.handlers.load_post.remove(handle_reset_bounds_cache)
+    getRegistryUpdateHandlers().remove(handle_bounds_geometry_update)
+    bpy.app.handlers.load_post.remove(handle_subscribe_keymap_cache)
+    unsubscribe_keymap_cache()
+    getRegistryUpdateHandlers().remove(handle_invalidate_rig_registry)
+    bpy.app.handlers.redo_post.remove(handle_reset_rig_registry)
+    bpy.app.handlers.undo_post.remove(handle_reset_rig_registry)
+    bpy.app.handlers.load_post.remove(handle_reset_rig_registry)
+    bpy.app.handlers.load_post.remove(handle_reload_decoded_hdris)
+    bpy.app.handlers.load_post.remove(handle_subscribe_auto_hdri)
+    unsubscribeAutoHDRI()
+
     del Scn.ds_scale
     del Scn.ds_include_camera
+    del Scn.hdri_resolution
+    del Scn.ds_hdri_resolution_user_set
+    del Scn.ds_progressive_hdri
+    del Scn.ds_hdri_filter
+    del Scn.ds_hdri_memory_budget
+    del Scn.ds_rig_preset
+    del Scn.ds_rig_source
+    del Scn.ds_frame_fraction
+    del Scn.ds_navigation_quality
+    del Scn.ds_navigation_samples
     del Scn.ds_scene_created
+    del Scn.ds_rig_id
 
     for cls in reversed(classes):
         unregister_class(cls)
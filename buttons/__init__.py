@@ -18,3 +18,5 @@
 from .setup_default_scene import *
 from .delete_default_scene import *
 from .position_default_camera import *
+from .frame_default_camera import *
+from .save_rig_library import *
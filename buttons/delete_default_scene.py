@@ -51,16 +51,8 @@ class SCENE_OT_delete_default_scene(bpy.types.Operator):
     # class methods
 
     def removeObjects(self):
-        scn = bpy.context.scene
-        cam_ob = bpy.data.objects.get("Default_Scene_camera_object")
-        emit1 = bpy.data.objects.get("Default_Scene_emitter_1")
-        emit2 = bpy.data.objects.get("Default_Scene_emitter_2")
-        emit3 = bpy.data.objects.get("Default_Scene_emitter_3")
-        parent1 = bpy.data.objects.get("Default_Scene_parent_1")
-        parent2 = bpy.data.objects.get("Default_Scene_parent_2")
-        parent3 = bpy.data.objects.get("Default_Scene_parent_3")
-        allObjs = [cam_ob, emit1, emit2, emit3, parent1, parent2, parent3]
-        delete(allObjs)
+        num_removed, freed = removeRig()
+        self.report({"INFO"}, "Removed %(num_removed)d datablocks, freed %(mb).1f MB of image memory" % {"num_removed":num_removed, "mb":freed / 1024 ** 2})
         tag_redraw_areas(areaTypes=["VIEW_3D"])
 
     #############################################
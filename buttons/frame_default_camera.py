@@ -0,0 +1,67 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# System imports
+# NONE!
+
+# Blender imports
+import bpy
+
+# Addon imports
+from ..functions import *
+from ..functions.framing import frameCamera
+
+class SCENE_OT_frame_default_camera(bpy.types.Operator):
+    """move default scene camera so the Bricker model or selected objects fill the frame"""
+    bl_idname = "scene.frame_default_camera"
+    bl_label = "Frame Default Camera"
+    bl_options = {"REGISTER", "UNDO"}
+
+    ################################################
+    # Blender Operator methods
+
+    @classmethod
+    def poll(self, context):
+        """ ensures operator can execute (if not, returns false) """
+        scn = context.scene
+        return scn.ds_include_camera and getRigObject(CAMERA_ROLE, scn) is not None
+
+    def execute(self, context):
+        scn = context.scene
+        targets = self.getTargets(context)
+        if not targets:
+            self.report({"WARNING"}, "Select objects to frame")
+            return {"CANCELLED"}
+        cam_ob = getRigObject(CAMERA_ROLE, scn)
+        frameCamera(cam_ob, targets, fraction=scn.ds_frame_fraction, scn=scn)
+        return {"FINISHED"}
+
+    #############################################
+    # class methods
+
+    def getTargets(self, context):
+        scn = context.scene
+        cm = None if not isBrickerInstalled() or scn.cmlist_index == -1 else scn.cmlist[scn.cmlist_index]
+        if cm is not None and cm.source_obj is not None:
+            return [cm.source_obj]
+        rig_objs = getRigObjects(scn)
+        targets = [obj for obj in context.selected_objects if obj not in rig_objs]
+        if not targets and context.active_object is not None and context.active_object not in rig_objs:
+            targets = [context.active_object]
+        return targets
+
+    #############################################
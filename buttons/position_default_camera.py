@@ -17,14 +17,17 @@
 
 # System imports
 import os
+import time
 from math import radians
 
 # Blender imports
 import bpy
+from bpy.props import *
 from mathutils import Vector
 
 # Addon imports
 from ..functions import *
+from ..functions.event_replay import EventRecorder, StandInEvent
 
 class SCENE_OT_position_default_camera(bpy.types.Operator):
     """create (or update/delete) scene with custom default lighting and world settings"""
@@ -38,10 +41,12 @@ class SCENE_OT_position_default_camera(bpy.types.Operator):
     @classmethod
     def poll(self, context):
         """ ensures operator can execute (if not, returns false) """
-        cam_ob = bpy.data.objects.get("Default_Scene_camera_object")
+        cam_ob = getRigObject(CAMERA_ROLE, context.scene)
         return cam_ob is not None and context.scene.ds_include_camera
 
     def execute(self, context):
+        if self.record_path:
+            self.recorder = EventRecorder(bpy.path.abspath(self.record_path))
         self.start()
         # create timer for modal
         wm = bpy.context.window_manager
@@ -49,10 +54,26 @@ class SCENE_OT_position_default_camera(bpy.types.Operator):
         return {"RUNNING_MODAL"}
 
     def modal(self, context, event):
+        if self.recorder is not None:
+            self.recorder.record(event)
         if event.type == "RET":
             return self.end_commit()
         if event.type == "ESC":
             return self.end_cancel()
+        if self.coalesce_events and event.type in Actions.mousemove_actions:
+            now = self.event_time(event)
+            if now - self.last_move_time < self.frame_budget / 1000:
+                # only the latest move within the frame budget reaches 'Actions.update' (running view navigation operators see every move before this operator)
+                self.pending_move = StandInEvent(event.type, event.value, event.mouse_region_x, event.mouse_region_y,
+                                                 event.ctrl, event.shift, event.alt, event.oskey)
+                return {"RUNNING_MODAL"}
+            self.last_move_time = now
+            self.pending_move = None
+        elif self.pending_move is not None:
+            # replay latest consumed move before the next event
+            self.last_move_time = self.event_time(event)
+            self.actions.update(context, self.pending_move, print_actions=False)
+            self.pending_move = None
         self.actions.update(context, event, print_actions=False)
         return {"PASS_THROUGH"} if self.actions.navigating() or event.type == "RIGHTMOUSE" else {"RUNNING_MODAL"}
 
@@ -60,24 +81,57 @@ class SCENE_OT_position_default_camera(bpy.types.Operator):
     # initialization method
 
     def __init__(self):
-        self.cam_ob = bpy.data.objects.get("Default_Scene_camera_object")
+        self.cam_ob = getRigObject(CAMERA_ROLE)
         self.actions = Actions(bpy.context, {})
         self.last_mx = self.cam_ob.matrix_world
+        self.recorder = None
+        self.last_move_time = float("-inf")
+        self.pending_move = None
+        self.saved_quality = []
+
+    ###################################################
+    # class variables
+
+    record_path = StringProperty(
+        name="Record Events",
+        description="Write the events received while positioning the camera to this JSONL file (for replay with 'functions/event_replay.py')",
+        subtype="FILE_PATH",
+        options={"SKIP_SAVE"},
+        default="")
+    coalesce_events = BoolProperty(
+        name="Coalesce Mouse Moves",
+        description="Skip camera positioning updates for mouse moves arriving within the frame budget (the latest skipped move is applied with the next event; viewport redraws are not affected)",
+        default=True)
+    frame_budget = FloatProperty(
+        name="Frame Budget",
+        description="Mouse moves arriving within this many milliseconds of the last processed one are collapsed into one",
+        min=0, soft_max=100,
+        default=1000 / 60)
 
     ###################################################
     # class methods
 
+    def event_time(self, event):
+        """ get time of event in seconds (events are handled as they arrive) """
+        return time.perf_counter()
+
     def start(self):
         bpy.context.window.cursor_set("SCROLL_XY")
         self.viewCamera()
         setLockCameraToView(True)
         parent_clear(self.cam_ob)
+        scn = bpy.context.scene
+        if scn.ds_navigation_quality:
+            self.saved_quality = applyNavigationQuality(scn, samples=scn.ds_navigation_samples)
 
     def end(self):
         bpy.context.window.cursor_set("DEFAULT")
         setLockCameraToView(False)
+        restoreNavigationQuality(self.saved_quality)
+        if self.recorder is not None:
+            self.recorder.close()
         # self.viewLast()
-        p1 = bpy.data.objects.get("Default_Scene_parent_1")
+        p1 = getRigObject(PARENT_ROLES[0])
         if p1 is not None:
             self.cam_ob.parent = p1
             self.cam_ob.matrix_parent_inverse = p1.matrix_world.inverted()
@@ -0,0 +1,50 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# System imports
+# NONE!
+
+# Blender imports
+import bpy
+
+# Addon imports
+from ..functions import *
+
+class SCENE_OT_save_rig_library(bpy.types.Operator):
+    """save lights and world of the current default scene as the rig library used by 'Append' and 'Link'"""
+    bl_idname = "scene.save_rig_library"
+    bl_label = "Save Rig Library"
+    bl_options = {"REGISTER"}
+
+    ################################################
+    # Blender Operator methods
+
+    @classmethod
+    def poll(self, context):
+        """ ensures operator can execute (if not, returns false) """
+        scn = context.scene
+        return b280() and scn.world is not None and getRigObject(PARENT_ROLES[1], scn) is not None
+
+    def execute(self, context):
+        try:
+            path = writeRigLibrary(context.scene)
+        except (OSError, ValueError) as e:
+            self.report({"ERROR"}, str(e))
+            return {"CANCELLED"}
+        self.report({"INFO"}, "Saved rig library to '%(path)s'" % locals())
+        return {"FINISHED"}
+
+    #############################################
@@ -44,19 +44,56 @@ class SCENE_OT_setup_default_scene(bpy.types.Operator):
     def execute(self, context):
         scn = context.scene
 
-        parent1, parent2 = self.addParentObj()
-
-        self.setWorldValues()
-        l1, l2, l3 = self.addLightObjects(parent2)
-        self.cam_ob = self.addCameraObject(parent1, include=scn.ds_include_camera)
+        try:
+            plan = getRigPreset(scn.ds_rig_preset) if scn.ds_rig_preset else None
+        except (OSError, ValueError) as e:
+            self.report({"ERROR"}, str(e))
+            return {"CANCELLED"}
+        light_specs = plan["lights"] if plan else LIGHT_SPECS
+        camera_spec = plan["camera"] if plan else CAMERA_SPEC
+        # a resolution picked by the user takes precedence over the preset's
+        if plan and plan["hdri_resolution"]:
+            setPresetHDRIResolution(scn, plan["hdri_resolution"])
+
+        rig_source = scn.ds_rig_source
+        if rig_source == "LINK" and not b280():
+            rig_source = "APPEND"
+        if rig_source != "BUILD" and not os.path.exists(getRigLibraryPath()):
+            self.report({"WARNING"}, "Rig library not found, building rig instead: '%s'" % getRigLibraryPath())
+            rig_source = "BUILD"
+
+        try:
+            if rig_source == "LINK":
+                # lights and world are shared with the library; parent 1 instances the linked rig collection
+                parent1 = ensureObject(PARENT_NAMES[0], role=PARENT_ROLES[0], scn=scn)
+                setIfChanged(parent1, "scale", (scn.ds_scale, scn.ds_scale, scn.ds_scale))
+                linkRig(parent1, scn)
+            elif rig_source == "APPEND" and not getRigLights(scn) and getRigObject(PARENT_ROLES[1], scn) is None:
+                # appended lights are reconciled against the preset below like built ones
+                appendRig(ensureObject(PARENT_NAMES[0], role=PARENT_ROLES[0], scn=scn), scn)
+        except (OSError, ValueError) as e:
+            self.report({"ERROR"}, str(e))
+            return {"CANCELLED"}
+        if rig_source != "LINK":
+            parent1, parent2 = self.addParentObj()
+            self.setWorldValues(strength=plan["world_strength"] if plan else 0.9)
+            self.addLightObjects(parent2, specs=light_specs)
+        self.cam_ob = self.addCameraObject(parent1, include=scn.ds_include_camera, spec=camera_spec)
 
         cm = None if not isBrickerInstalled() or scn.cmlist_index == -1 else scn.cmlist[scn.cmlist_index]
-        parent1.location = self.orig_active_obj.location if cm is None else bounds(cm.source_obj).mid
+        rig_objs = getRigObjects(scn)
+        selection = [obj for obj in self.orig_selection if obj not in rig_objs]
+        if cm is not None:
+            setIfChanged(parent1, "location", getCachedBounds(cm.source_obj).mid)
+        elif len(selection) > 1:
+            setIfChanged(parent1, "location", getCachedBoundsUnion(selection).mid)
+        elif self.orig_active_obj is not None:
+            setIfChanged(parent1, "location", self.orig_active_obj.location)
 
         if scn.ds_include_camera:
-            self.cam_ob.data.dof_object = self.orig_active_obj if cm is None else cm.source_obj
-            self.cam_ob.data.cycles.aperture_type = 'FSTOP'
-            self.cam_ob.data.cycles.aperture_fstop = 1
+            setIfChanged(self.cam_ob.data, "dof_object", self.orig_active_obj if cm is None else cm.source_obj)
+            setIfChanged(self.cam_ob.data.cycles, "aperture_type", 'FSTOP')
+            setIfChanged(self.cam_ob.data.cycles, "aperture_fstop", 1)
 
         scn.ds_scene_created = True
         setActiveObj(self.orig_active_obj)
@@ -74,10 +111,11 @@ class SCENE_OT_setup_default_scene(bpy.types.Operator):
     #############################################
     # class methods
 
-    def setWorldValues(self):
+    def setWorldValues(self, strength=0.9):
         scn = bpy.context.scene
-        scn.world.use_nodes = True
-        scn.world.light_settings.use_ambient_occlusion = False
+        if not scn.world.use_nodes:
+            scn.world.use_nodes = True
+        setIfChanged(scn.world.light_settings, "use_ambient_occlusion", False)
 
         #select world node tree
         nt = scn.world.node_tree
@@ -92,171 +130,45 @@ class SCENE_OT_setup_default_scene(bpy.types.Operator):
         worldOutNode = nt.nodes.get("World Output")
         # ensure background node exists and is connected to world output node
         backNode = nt.nodes.get('Background')
-        backConnected = False
-        if backNode is not None:
-            for link in backNode.outputs['Background'].links:
-                if link.to_node == worldOutNode:
-                    backConnected = True
         if backNode is None:
             backNode = nt.nodes.new('ShaderNodeBackground')
             backNode.location = worldOutNode.location
-        if not backConnected:
-            backBackOut = backNode.outputs['Background']
-            worldSurfIn = worldOutNode.inputs['Surface']
-            nt.links.new(backBackOut, worldSurfIn)
+        ensureLink(nt, backNode.outputs['Background'], worldOutNode.inputs['Surface'])
         # position envTexNode to left of background node
-        envTexNode.location = backNode.location - Vector((300, 0))
+        setIfChanged(envTexNode, "location", backNode.location - Vector((300, 0)))
 
         # connect color out of envTexNode to Color in of background node
-        envTexColOut = envTexNode.outputs['Color']
-        backColIn = backNode.inputs['Color']
-        nt.links.new(envTexColOut, backColIn)
+        ensureLink(nt, envTexNode.outputs['Color'], backNode.inputs['Color'])
 
         # add texture mapping nodes
         texNode = nt.nodes.get('Texture Coordinate')
         if texNode is None:
             texNode = nt.nodes.new('ShaderNodeTexCoord')
-        texNode.location = envTexNode.location - Vector((650, 0))
+        setIfChanged(texNode, "location", envTexNode.location - Vector((650, 0)))
         mapNode = nt.nodes.get('Mapping')
         if mapNode is None:
             mapNode = nt.nodes.new('ShaderNodeMapping')
-        mapNode.location = texNode.location + Vector((250, 0))
-        nt.links.new(texNode.outputs[0], mapNode.inputs[0])
-        nt.links.new(mapNode.outputs[0], envTexNode.inputs[0])
+        setIfChanged(mapNode, "location", texNode.location + Vector((250, 0)))
+        ensureLink(nt, texNode.outputs[0], mapNode.inputs[0])
+        ensureLink(nt, mapNode.outputs[0], envTexNode.inputs[0])
 
 
         # set backNode strength value
-        backNode.inputs["Strength"].default_value = 0.9
+        setIfChanged(backNode.inputs["Strength"], "default_value", strength)
         # set backNode image value
         loadHDRI(self, bpy.context)
 
     def addParentObj(self):
-        scn = bpy.context.scene
-
-        parent1 = bpy.data.objects.new("Default_Scene_parent_1", None)
-        parent1.scale = (scn.ds_scale, scn.ds_scale, scn.ds_scale)
-        parent2 = bpy.data.objects.new("Default_Scene_parent_2", None)
-        parent2.parent = parent1
-
-        return parent1, parent2
-
-    def addCameraObject(self, parent=None, include=True):
-        scn = bpy.context.scene
-
-        cam = bpy.data.cameras.new("Default_Scene_camera")
-        cam_ob = bpy.data.objects.new("Default_Scene_camera_object", cam)
-        cam_ob.location = (1.2, -4, 1.4)
-        cam_ob.rotation_euler = (1.2708, 0, 0.3)
-
-        if parent:
-            cam_ob.parent = parent
-
-        if include:
-            link_object(cam_ob)
-            select(cam_ob, active=cam_ob)
-            scn.camera = cam_ob
-
-        return cam_ob
-
-    def addLightObjects(self, parent=None):
-        scn = bpy.context.scene
-        last_render_engine = scn.render.engine
-        scn.render.engine = "CYCLES"
-
-        # emit1_color = (0.576, 0.824, 0.953, 1)
-        # emit2_color = (0.529, 0.733, 0.922, 1)
-        # emit3_color = (1, 1, 0.95, 1)
-        emit1_color = (1, 1, 1, 1)
-        emit2_color = (1, 1, 1, 1)
-        emit3_color = (1, 1, 1, 1)
-        emit1_energy = 1
-        emit2_energy = 1
-        emit3_energy = 1
-
-        # add area lamp 1
-        light_add(type='AREA')
-        emit1 = bpy.context.active_object
-        emit1.name = "Default_Scene_emitter_1"
-        if b280(): emit1.data.size = 0.1
-        # CYCLES
-        nodes = emit1.data.node_tree.nodes
-        nodes["Emission"].inputs[0].default_value = emit1_color
-        nodes["Emission"].inputs[1].default_value = emit1_energy * 100
-        # lf = nodes.new('ShaderNodeLightFalloff')
-        # lf.inputs[0].default_value = emit1_energy * 100  # 175
-        # links = emit1.data.node_tree.links
-        # links.new(lf.outputs[0], nodes["Emission"].inputs[1])
-        # EEVEE
-        emit1.data.color = emit1_color[:3]
-        emit1.data.energy = emit1_energy
-
-
-        # add area lamp 2
-        light_add(type='AREA')
-        emit2 = bpy.context.active_object
-        emit2.name = "Default_Scene_emitter_2"
-        if b280(): emit2.data.size = 0.1
-        # CYCLES
-        nodes = emit2.data.node_tree.nodes
-        nodes["Emission"].inputs[0].default_value = emit2_color
-        nodes["Emission"].inputs[1].default_value = emit2_energy * 100
-        # lf = nodes.new('ShaderNodeLightFalloff')
-        # lf.inputs[0].default_value = emit2_energy * 100  # 160
-        # links = emit2.data.node_tree.links
-        # links.new(lf.outputs[0], nodes["Emission"].inputs[1])
-        # EEVEE
-        emit2.data.color = emit2_color[:3]
-        emit2.data.energy = emit2_energy
-
-        # add area lamp 3
-        light_add(type='AREA')
-        emit3 = bpy.context.active_object
-        emit3.name = "Default_Scene_emitter_3"
-        if b280(): emit3.data.size = 0.1
-        # CYCLES
-        nodes = emit3.data.node_tree.nodes
-        nodes["Emission"].inputs[0].default_value = emit3_color
-        nodes["Emission"].inputs[1].default_value = emit3_energy * 100
-        # lf = nodes.new('ShaderNodeLightFalloff')
-        # lf.inputs[0].default_value = emit3_energy * 100  # 100
-        # links = emit3.data.node_tree.links
-        # links.new(lf.outputs[0], nodes["Emission"].inputs[1])
-        # EEVEE
-        emit3.data.color = emit3_color[:3]
-        emit3.data.energy = emit3_energy
+        return reconcileParents()
 
-        emit1.location = (2.5, 0, 1.2)
-        emit1.rotation_euler = (radians(70), radians(-12), radians(90))
-        emit1.scale = (30, 25, 30)
+    def addCameraObject(self, parent=None, include=True, spec=CAMERA_SPEC):
+        return reconcileCamera(parent, include=include, spec=spec)
 
-        emit2.location = (-1.8, -0.8, 0.6)
-        emit2.rotation_euler = (radians(90), radians(-3), radians(-70))
-        emit2.scale = (25, 20, 30)
-
-        emit3.location = (0.25, 0.53, 1.75)
-        emit3.rotation_euler = (radians(-4), radians(4), radians(35))
-        emit3.scale = (30, 10, 20)
-
-        if parent:
-            emit1.parent = parent
-            emit2.parent = parent
-            emit3.parent = parent
-
-        scn.render.engine = last_render_engine
-
-        return emit1, emit2, emit3
+    def addLightObjects(self, parent=None, specs=LIGHT_SPECS):
+        return reconcileLightRig(parent, specs=specs)
 
     def removeObjects(self):
-        scn = bpy.context.scene
-        cam_ob = bpy.data.objects.get("Default_Scene_camera_object")
-        emit1 = bpy.data.objects.get("Default_Scene_emitter_1")
-        emit2 = bpy.data.objects.get("Default_Scene_emitter_2")
-        emit3 = bpy.data.objects.get("Default_Scene_emitter_3")
-        parent1 = bpy.data.objects.get("Default_Scene_parent_1")
-        parent2 = bpy.data.objects.get("Default_Scene_parent_2")
-        parent3 = bpy.data.objects.get("Default_Scene_parent_3")
-        allObjs = [cam_ob, emit1, emit2, emit3, parent1, parent2, parent3]
-        delete(allObjs)
+        removeRig()
         tag_redraw_areas(areaTypes=["VIEW_3D"])
 
     #############################################
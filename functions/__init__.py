@@ -16,7 +16,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from .common import *
+from .bounds_cache import *
 from .general import *
+from .hdri import *
 from .mesh_generate import *
+from .navigation_quality import *
+from .presets import *
 from .prop_update_utils import *
+from .rig import *
+from .rig_registry import *
+from .rig_library import *
 from .useractions import *
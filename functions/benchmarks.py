@@ -0,0 +1,157 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmarks for performance sensitive code paths (not imported by the addon)
+
+Run from Blender's Python console or in the background, e.g.:
+    blender --background --python-expr "import default_scene.functions.benchmarks as b; b.benchLightRig()"
+"""
+
+# System imports
+import math
+import time
+import numpy as np
+
+# Blender imports
+import bpy
+import bmesh
+from mathutils import Euler, Matrix, Vector
+
+# Addon imports
+from .common import *
+from .mesh_generate import arraysToBMesh, torusArrays
+from .rig import *
+from .useractions import Actions
+from .event_replay import StandInEvent, getStandInContext
+
+
+def timeit(fn, iterations:int, setup=None, teardown=None):
+    """ returns list of seconds per call of 'fn' ('setup'/'teardown' are not timed) """
+    times = []
+    for i in range(iterations):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        ret = fn(*args)
+        times.append(time.perf_counter() - start)
+        if teardown: teardown(ret)
+    return times
+
+
+def printComparison(label:str, baseline:list, optimized:list):
+    """ print median timings of two implementations and the speedup """
+    med_base = sorted(baseline)[len(baseline) // 2]
+    med_opt = sorted(optimized)[len(optimized) // 2]
+    print("%(label)s: %(base).3f ms -> %(opt).3f ms (%(speedup).1fx)" % {"label":label, "base":med_base * 1000, "opt":med_opt * 1000, "speedup":med_base / max(med_opt, 1e-9)})
+    return med_base, med_opt
+
+
+def _createLightRigOps():
+    """ light rig construction through 'bpy.ops.object.light_add' (previous implementation) """
+    scn = bpy.context.scene
+    last_render_engine = scn.render.engine
+    scn.render.engine = "CYCLES"
+    lights = []
+    for spec in LIGHT_SPECS:
+        light_add(type="AREA")
+        light_ob = bpy.context.active_object
+        light_ob.name = spec["name"]
+        setLightValues(light_ob, spec)
+        lights.append(light_ob)
+    scn.render.engine = last_render_engine
+    return lights
+
+
+def _removeLights(lights:list):
+    for light_ob in lights:
+        light = light_ob.data
+        bpy.data.objects.remove(light_ob, do_unlink=True)
+        bpy_lights().remove(light)
+
+
+def benchLightRig(iterations:int=20):
+    """ compare light rig setup latency of operator path and data API path """
+    ops_times = timeit(_createLightRigOps, iterations, teardown=_removeLights)
+    data_times = timeit(createLightRig, iterations, teardown=_removeLights)
+    return printComparison("Light rig setup", ops_times, data_times)
+
+
+def _trackpadEvents(n:int):
+    """ event stream of fast trackpad navigation (mostly mouse moves) """
+    events = []
+    for i in range(n):
+        if i % 50 == 0:
+            events.append(StandInEvent("TRACKPADPAN", "NOTHING", i % 800, i % 600))
+        elif i % 97 == 0:
+            events.append(StandInEvent("MIDDLEMOUSE", "PRESS" if i % 2 else "RELEASE", i % 800, i % 600, shift=True))
+        else:
+            events.append(StandInEvent("INBETWEEN_MOUSEMOVE" if i % 3 else "MOUSEMOVE", "NOTHING", i % 800, i % 600))
+    return events
+
+
+def benchActions(num_events:int=100000, iterations:int=5):
+    """ measure events per second through Actions.update + Actions.navigating (as in the camera positioning modal) """
+    # background mode has no region to read the view size from
+    context = getStandInContext()
+    actions = Actions(context, {})
+    events = _trackpadEvents(num_events)
+    def run():
+        update, navigating = actions.update, actions.navigating
+        for event in events:
+            update(context, event)
+            navigating()
+    times = timeit(run, iterations)
+    med = sorted(times)[len(times) // 2]
+    print("Actions dispatch: %(eps).0f events/s (%(us).2f us/event)" % {"eps":num_events / med, "us":med / num_events * 1e6})
+    return num_events / med
+
+
+def benchTransformPoints(num_points:int=10000, iterations:int=5):
+    """ compare per-vector matrix multiplication with the array transform (both compute mat @ v) """
+    mat = mathutils_mult(Matrix.Translation((1, 2, 3)), Euler((0.3, 0.2, 0.1)).to_matrix().to_4x4(), Matrix.Scale(2, 4))
+    points = np.random.random((num_points, 3))
+    vecs = [Vector(p) for p in points.tolist()]
+    loop_times = timeit(lambda: [mathutils_mult(mat, v) for v in vecs], iterations)
+    out = np.empty_like(points)
+    array_times = timeit(lambda: transformPointsToWorld(points, mat, out=out), iterations)
+    assert np.allclose(out, [mathutils_mult(mat, v) for v in vecs], atol=1e-5)
+    return printComparison("Transform %(num_points)d points" % locals(), loop_times, array_times)
+
+
+def _makeTorusBMesh(R:float, r:float, N:int, M:int):
+    """ torus construction with one bmesh call per vert and face """
+    bme = bmesh.new()
+    rings = []
+    for i in range(N):
+        u = (2 * math.pi / N) * i
+        ring = []
+        for j in range(M):
+            v = (2 * math.pi / M) * j
+            dist = R + r * math.cos(v)
+            ring.append(bme.verts.new((dist * math.cos(u), dist * math.sin(u), r * math.sin(v))))
+        rings.append(ring)
+    for i in range(N):
+        for j in range(M):
+            bme.faces.new((rings[i][j], rings[i - N + 1][j], rings[i - N + 1][j - M + 1], rings[i][j - M + 1]))
+    return bme
+
+
+def benchTorus(R:float=1, r:float=0.25, N:int=256, M:int=128, iterations:int=5):
+    """ compare bmesh loop torus construction with the array generator (uncached) """
+    loop_times = timeit(lambda: _makeTorusBMesh(R, r, N, M), iterations, teardown=lambda bme: bme.free())
+    array_times = timeit(lambda: arraysToBMesh(torusArrays(R, r, N, M))[0], iterations, teardown=lambda bme: bme.free())
+    return printComparison("Torus %(N)dx%(M)d" % locals(), loop_times, array_times)
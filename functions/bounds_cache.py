@@ -0,0 +1,104 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# System imports
+import numpy as np
+from collections import OrderedDict
+
+# Blender imports
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Object
+
+# Addon imports
+from .common import *
+from .common.transform import _boundsInfo
+
+
+BOUNDS_CACHE_SIZE = 64
+
+# (object pointer, local, use_vertices) -> (object name, matrix bytes, geometry revision, (min, max) tuples), least recently used first
+_bounds_cache = OrderedDict()
+# ID pointer -> number of geometry updates seen for the object or its data
+_geometry_revisions = {}
+
+
+def getGeometryRevision(obj:Object):
+    """ get revision counter of object geometry (changes whenever the depsgraph reports a geometry update) """
+    rev = _geometry_revisions.get(obj.as_pointer(), 0)
+    if obj.data is not None:
+        rev = (rev, _geometry_revisions.get(obj.data.as_pointer(), 0))
+    return rev
+
+
+def getCachedBounds(obj:Object, local:bool=False, use_vertices:bool=False):
+    """ same as bounds(), but reuses the result while the object transform and geometry are unchanged (returns a new details object each call) """
+    # 2.79 has no depsgraph updates to detect geometry changes with
+    if not b280():
+        return boundsMulti([obj], local=local, use_vertices=use_vertices)[0]
+    key = (obj.as_pointer(), local, use_vertices)
+    mx = b"" if local else np.array(obj.matrix_world, dtype=np.float64).tobytes()
+    rev = getGeometryRevision(obj)
+    entry = _bounds_cache.get(key)
+    if entry is not None and entry[0] == obj.name and entry[1] == mx and entry[2] == rev:
+        _bounds_cache.move_to_end(key)
+        return _boundsInfo(*entry[3])
+    info = boundsMulti([obj], local=local, use_vertices=use_vertices)[0]
+    # cache immutable values, callers may modify the vectors they get
+    _bounds_cache[key] = (obj.name, mx, rev, (tuple(info.min), tuple(info.max)))
+    _bounds_cache.move_to_end(key)
+    while len(_bounds_cache) > BOUNDS_CACHE_SIZE:
+        _bounds_cache.popitem(last=False)
+    return info
+
+
+def getCachedBoundsUnion(objs:iter, use_vertices:bool=False):
+    """ get bounds() details of the union of objects (each object's bounds are cached) """
+    infos = [getCachedBounds(obj, use_vertices=use_vertices) for obj in confirmIter(objs)]
+    if not infos:
+        return None
+    mins = np.array([info.min for info in infos]).min(axis=0)
+    maxs = np.array([info.max for info in infos]).max(axis=0)
+    return _boundsInfo(mins.tolist(), maxs.tolist())
+
+
+def invalidateBoundsCache(obj:Object=None):
+    """ drop cached bounds of object (or of all objects) """
+    if obj is None:
+        _bounds_cache.clear()
+        _geometry_revisions.clear()
+        return
+    ptr = obj.as_pointer()
+    for key in [key for key in _bounds_cache if key[0] == ptr]:
+        del _bounds_cache[key]
+
+
+@persistent
+def handle_bounds_geometry_update(scn, depsgraph=None):
+    # 'scene_update_post' (2.79) passes no depsgraph
+    if not _bounds_cache or depsgraph is None:
+        return
+    for update in depsgraph.updates:
+        if update.is_updated_geometry:
+            ptr = update.id.original.as_pointer()
+            _geometry_revisions[ptr] = _geometry_revisions.get(ptr, 0) + 1
+
+
+@persistent
+def handle_reset_bounds_cache(dummy):
+    # ID pointers are reused after loading a file or undoing
+    invalidateBoundsCache()
@@ -21,5 +21,6 @@ from .maths import *
 from .paths import *
 from .python_utils import *
 from .reporting import *
+from .rgbe import *
 from .transform import *
 from .wrappers import *
@@ -74,13 +74,24 @@ def get_addon_directory():
 
 def delete(objs, remove_meshes:bool=False):
     """ efficient deletion of objects """
-    objs = confirmIter(objs)
-    for obj in objs:
-        if obj is None:
-            continue
-        if remove_meshes: m = obj.data
-        bpy.data.objects.remove(obj, do_unlink=True)
-        if remove_meshes and m is not None: bpy.data.meshes.remove(m)
+    objs = [obj for obj in confirmIter(objs) if obj is not None]
+    meshes = [obj.data for obj in objs if obj.type == "MESH" and obj.data is not None] if remove_meshes else []
+    batch_remove(objs + meshes)
+
+
+@blender_version_wrapper('<=','2.79')
+def batch_remove(ids:iter):
+    """ remove datablocks (of any ID type) in one call """
+    for id_data in ids:
+        # e.g. 'Object' -> 'objects', 'Lamp' -> 'lamps', 'Mesh' -> 'meshes'
+        id_type = id_data.bl_rna.identifier.lower()
+        getattr(bpy.data, id_type + ("es" if id_type.endswith("sh") else "s")).remove(id_data, do_unlink=True)
+@blender_version_wrapper('>=','2.80')
+def batch_remove(ids:iter):
+    """ remove datablocks (of any ID type) in one call """
+    ids = set(ids)
+    if ids:
+        bpy.data.batch_remove(ids=ids)
 
 
 def duplicate(obj:Object, linked:bool=False, link_to_scene:bool=False):
@@ -476,6 +487,14 @@ def bpy_collections():
     return bpy.data.collections
 
 
+@blender_version_wrapper('<=','2.79')
+def bpy_lights():
+    return bpy.data.lamps
+@blender_version_wrapper('>=','2.80')
+def bpy_lights():
+    return bpy.data.lights
+
+
 @blender_version_wrapper('<=','2.79')
 def set_active_scene(scene:Scene):
     bpy.context.screen.scene = scene
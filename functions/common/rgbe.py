@@ -0,0 +1,252 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# System imports
+import os
+import mmap
+import numpy as np
+
+# Blender imports
+# NONE!
+
+
+class RGBEImage:
+    """ memory-mapped Radiance .hdr (RGBE) image, decoded in blocks of scanlines without a Blender datablock """
+
+    def __init__(self, path:str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("Empty Radiance file: '%(path)s'" % locals())
+        self._data = np.frombuffer(self._mm, dtype=np.uint8)
+        self.width, self.height, self.bottom_up, self.data_offset = self._parseHeader()
+        # new-style RLE scanlines start with (2, 2, width >> 8, width & 255)
+        w = self.width
+        self.rle = 8 <= w <= 0x7fff and tuple(self._data[self.data_offset:self.data_offset + 4]) == (2, 2, w >> 8, w & 255)
+        self._literal_layout = self._literalLayout() if self.rle else None
+        if not self.rle and len(self._data) - self.data_offset < w * self.height * 4:
+            # flat files store 4 bytes per pixel, anything shorter uses old-style (repeat pixel) RLE
+            self.close()
+            raise ValueError("Old-style RLE Radiance files are not supported: '%(path)s'" % locals())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        self._data = None
+        self._mm.close()
+        self._file.close()
+
+    def _parseHeader(self):
+        mm = self._mm
+        if not (mm[:10] == b"#?RADIANCE" or mm[:6] == b"#?RGBE"):
+            raise ValueError("Not a Radiance file: '%s'" % self.path)
+        pos = 0
+        while True:
+            end = mm.find(b"\n", pos)
+            if end == -1:
+                raise ValueError("Truncated Radiance header: '%s'" % self.path)
+            line = mm[pos:end].strip()
+            pos = end + 1
+            if line.startswith(b"FORMAT=") and line != b"FORMAT=32-bit_rle_rgbe":
+                raise ValueError("Unsupported Radiance format '%s': '%s'" % (line[7:].decode(), self.path))
+            if line == b"":
+                break
+        end = mm.find(b"\n", pos)
+        res = mm[pos:end].split()
+        if len(res) != 4 or res[0] not in (b"-Y", b"+Y") or res[2] != b"+X":
+            raise ValueError("Unsupported Radiance orientation '%s': '%s'" % (b" ".join(res).decode(), self.path))
+        return int(res[3]), int(res[1]), res[0] == b"+Y", end + 1
+
+    def _literalLayout(self):
+        """ get (scanline size, pixel byte offsets, header byte offsets, header counts) of scanlines made of literal runs of 128 (as written by 'writeRGBE') """
+        w = self.width
+        n_full, rem = divmod(w, 128)
+        plane_size = w + n_full + (1 if rem else 0)
+        x = np.arange(w)
+        # each run of 128 pixels is preceded by its count byte
+        plane_offsets = x + x // 128 + 1
+        offsets = 4 + (np.arange(4)[:, None] * plane_size + plane_offsets).ravel()
+        size = 4 + 4 * plane_size
+        headers = np.setdiff1d(np.arange(4, size), offsets)
+        counts = np.full(len(headers), 128, dtype=np.uint8)
+        if rem:
+            counts[len(headers) // 4 - 1::len(headers) // 4] = rem
+        return size, offsets, headers, counts
+
+    def _decodeLiteralScanlines(self, pos:int, out:np.ndarray):
+        """ decode scanlines into (n, 4, w) uint8 planes in one gather if they only hold literal runs of 128, returns next position or None """
+        n, w = len(out), self.width
+        size, offsets, headers, counts = self._literal_layout
+        block = self._data[pos:pos + n * size]
+        if len(block) != n * size:
+            return None
+        block = block.reshape(n, size)
+        if not ((block[:, :4] == (2, 2, w >> 8, w & 255)).all() and (block[:, headers] == counts).all()):
+            return None
+        out[:] = block[:, offsets].reshape(n, 4, w)
+        return pos + n * size
+
+    def _decodeScanlines(self, pos:int, out:np.ndarray, first_row:int=0):
+        """ decode RLE scanlines starting at 'pos' into (n, 4, w) uint8 planes, returns next scanline position """
+        next_pos = self._decodeLiteralScanlines(pos, out)
+        if next_pos is not None:
+            return next_pos
+        mm, w, end = self._mm, self.width, len(self._mm)
+        marker = (2, 2, w >> 8, w & 255)
+        # walk run headers (each count locates the next one), pixel bytes are gathered afterwards
+        starts, counts, literal = [], [], []
+        for row in range(first_row, first_row + len(out)):
+            if tuple(mm[pos:pos + 4]) != marker:
+                raise ValueError("Scanline %(row)d of '%(path)s' is not new-style RLE (old-style or corrupt)" % {"row":row, "path":self.path})
+            pos += 4
+            for plane in range(4):
+                x = 0
+                while x < w:
+                    if pos >= end:
+                        raise ValueError("Truncated RLE scanline %(row)d in '%(path)s'" % {"row":row, "path":self.path})
+                    count = mm[pos]
+                    is_literal = count <= 128
+                    if not is_literal:
+                        count -= 128
+                    if count == 0 or x + count > w or (is_literal and pos + 1 + count > end):
+                        raise ValueError("Corrupt RLE run at byte %(pos)d of '%(path)s' (scanline %(row)d overflows width %(w)d)" % {"pos":pos, "path":self.path, "row":row, "w":w})
+                    starts.append(pos + 1)
+                    counts.append(count)
+                    literal.append(is_literal)
+                    pos += count + 1 if is_literal else 2
+                    x += count
+        counts = np.array(counts, dtype=np.int64)
+        run_first = np.cumsum(counts) - counts
+        # literal runs read consecutive bytes, repeat runs read their single value byte for every pixel
+        step = np.repeat(np.array(literal, dtype=np.int64), counts)
+        src = np.repeat(np.array(starts, dtype=np.int64), counts)
+        src += (np.arange(len(step), dtype=np.int64) - np.repeat(run_first, counts)) * step
+        out[:] = self._data[src].reshape(out.shape)
+        return pos
+
+    def iterRGBEBlocks(self, block_rows:int=64):
+        """ yield (first row, (n, w, 4) uint8 RGBE block) in file order (block buffer is reused between yields) """
+        w, h = self.width, self.height
+        if not self.rle:
+            # copied out of the memory map, views into it would keep 'close' from unmapping the file
+            flat = self._data[self.data_offset:self.data_offset + w * h * 4].reshape(h, w, 4)
+            block = np.empty((block_rows, w, 4), dtype=np.uint8)
+            for y in range(0, h, block_rows):
+                n = min(block_rows, h - y)
+                block[:n] = flat[y:y + n]
+                yield y, block[:n]
+            return
+        pos = self.data_offset
+        planes = np.empty((block_rows, 4, w), dtype=np.uint8)
+        # keeps gather index arrays of the RLE decoder small
+        chunk_rows = max(1, (1 << 20) // w)
+        for y in range(0, h, block_rows):
+            n = min(block_rows, h - y)
+            for i in range(0, n, chunk_rows):
+                pos = self._decodeScanlines(pos, planes[i:min(i + chunk_rows, n)], y + i)
+            yield y, planes[:n].transpose(0, 2, 1)
+
+    def iterBlocks(self, block_rows:int=64):
+        """ yield (first row, (n, w, 3) float32 block), top row first """
+        blocks = self.iterRGBEBlocks(block_rows)
+        if not self.bottom_up:
+            for y, rgbe in blocks:
+                yield y, rgbeToFloat(rgbe)
+            return
+        # '+Y' files store the bottom row first
+        for y, rgbe in blocks:
+            yield self.height - y - len(rgbe), rgbeToFloat(rgbe[::-1])
+
+    def read(self, block_rows:int=64):
+        """ decode full image into single (h, w, 3) float32 array, top row first """
+        out = np.empty((self.height, self.width, 3), dtype=np.float32)
+        for y, block in self.iterBlocks(block_rows):
+            out[y:y + len(block)] = block
+        return out
+
+
+def rgbeToFloat(rgbe:np.ndarray, out:np.ndarray=None):
+    """ convert (..., 4) uint8 RGBE array to (..., 3) float32 array """
+    e = rgbe[..., 3]
+    scale = np.ldexp(np.ones(e.shape, dtype=np.float32), e.astype(np.int32) - (128 + 8))
+    scale[e == 0] = 0
+    if out is None:
+        out = np.empty(rgbe.shape[:-1] + (3,), dtype=np.float32)
+    np.add(rgbe[..., :3], 0.5, out=out, dtype=np.float32)
+    out *= scale[..., None]
+    return out
+
+
+def readRGBE(path:str, block_rows:int=64):
+    """ read Radiance .hdr file as (h, w, 3) float32 array, top row first """
+    with RGBEImage(path) as im:
+        return im.read(block_rows)
+
+
+def floatToRGBE(arr:np.ndarray):
+    """ convert (h, w, 3) float array to (h, w, 4) uint8 RGBE array """
+    arr = np.asarray(arr, dtype=np.float32)
+    m = arr.max(axis=2)
+    mant, exp = np.frexp(m)
+    valid = m > 1e-32
+    scale = np.zeros_like(m)
+    np.divide(mant * 256.0, m, out=scale, where=valid)
+    rgbe = np.empty(arr.shape[:2] + (4,), dtype=np.uint8)
+    rgbe[..., :3] = np.clip(arr * scale[..., None], 0, 255)
+    rgbe[..., 3] = np.where(valid, np.clip(exp + 128, 0, 255), 0)
+    return rgbe
+
+
+def _encodeScanlines(rgbe:np.ndarray):
+    """ encode (h, w, 4) RGBE rows as new-style RLE scanlines (literal runs only) """
+    h, w = rgbe.shape[:2]
+    n_full, rem = divmod(w, 128)
+    planes = rgbe.transpose(0, 2, 1)
+    chunks = []
+    if n_full:
+        full = planes[:, :, :n_full * 128].reshape(h, 4, n_full, 128)
+        counts = np.full((h, 4, n_full, 1), 128, dtype=np.uint8)
+        chunks.append(np.concatenate((counts, full), axis=3).reshape(h, 4, n_full * 129))
+    if rem:
+        counts = np.full((h, 4, 1), rem, dtype=np.uint8)
+        chunks.append(np.concatenate((counts, planes[:, :, n_full * 128:]), axis=2))
+    channels = np.concatenate(chunks, axis=2).reshape(h, -1)
+    markers = np.empty((h, 4), dtype=np.uint8)
+    markers[:] = (2, 2, w >> 8, w & 255)
+    return np.concatenate((markers, channels), axis=1).tobytes()
+
+
+def writeRGBE(path:str, arr:np.ndarray, block_rows:int=256):
+    """ write (h, w, 3) float array (top row first) to Radiance .hdr file """
+    h, w = arr.shape[:2]
+    # new-style RLE is only defined for these scanline widths
+    use_rle = 8 <= w <= 0x7fff
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"#?RADIANCE\nFORMAT=32-bit_rle_rgbe\n\n")
+        f.write(("-Y %d +X %d\n" % (h, w)).encode())
+        for y in range(0, h, block_rows):
+            rgbe = floatToRGBE(arr[y:y + block_rows])
+            f.write(_encodeScanlines(rgbe) if use_rle else rgbe.tobytes())
+    os.replace(tmp_path, path)
@@ -17,6 +17,7 @@
 
 # System imports
 import math
+import numpy as np
 
 # Blender imports
 import bpy
@@ -61,38 +62,87 @@ def parent_clear(objs, apply_transform:bool=True):
             obj.parent = None
 
 
+def getVertexCoords(obj:Object):
+    """ get (N, 3) float64 array of mesh vertex coordinates in object space (one foreach_get call) """
+    verts = obj.data.vertices
+    co = np.empty(len(verts) * 3, dtype=np.float64)
+    verts.foreach_get("co", co)
+    co.shape = (-1, 3)
+    return co
+
+
 def getBoundsBF(obj:Object):
     """ brute force method for obtaining object bounding box """
-    # initialize min and max
-    min = Vector((math.inf, math.inf, math.inf))
-    max = Vector((-math.inf, -math.inf, -math.inf))
-    # calculate min and max verts
-    for v in obj.data.vertices:
-        if v.co.x > max.x:
-            max.x = v.co.x
-        elif v.co.x < min.x:
-            min.x = v.co.x
-        if v.co.y > max.y:
-            max.y = v.co.y
-        elif v.co.y < min.y:
-            min.y = v.co.y
-        if v.co.z > max.z:
-            max.z = v.co.z
-        elif v.co.z < min.z:
-            min.z = v.co.z
-    # set up bounding box list of coord lists
-    bound_box = [list(min),
-                 [min.x, min.y, min.z],
-                 [min.x, min.y, max.z],
-                 [min.x, max.y, max.z],
-                 [min.x, max.y, min.z],
-                 [max.x, min.y, min.z],
-                 [max.y, min.y, max.z],
-                 list(max),
-                 [max.x, max.y, min.z]]
+    co = getVertexCoords(obj)
+    if len(co) == 0:
+        co = np.zeros((1, 3))
+    (x0, y0, z0), (x1, y1, z1) = co.min(axis=0).tolist(), co.max(axis=0).tolist()
+    # same corner order as 'obj.bound_box'
+    bound_box = [[x0, y0, z0],
+                 [x0, y0, z1],
+                 [x0, y1, z1],
+                 [x0, y1, z0],
+                 [x1, y0, z0],
+                 [x1, y0, z1],
+                 [x1, y1, z1],
+                 [x1, y1, z0]]
     return bound_box
 
 
+def _boundsInfo(mn, mx):
+    info = lambda: None
+    info.max = Vector(mx)
+    info.min = Vector(mn)
+    info.mid = (info.min + info.max) / 2
+    info.dist = info.max - info.min
+    return info
+
+
+def _localBoundBox(obj:Object, use_adaptive_domain:bool=True):
+    return getBoundsBF(obj) if is_smoke(obj) and is_adaptive(obj) and not use_adaptive_domain else obj.bound_box
+
+
+def getObjectPoints(objs:iter, local:bool=False, use_vertices:bool=False, use_adaptive_domain:bool=True):
+    """ get list of (N, 3) arrays of points bounding each object (bounding box corners, or mesh vertices if 'use_vertices') """
+    objs = list(confirmIter(objs))
+    if not objs:
+        return []
+    vert_mode = [use_vertices and obj.type == "MESH" and len(obj.data.vertices) > 0 for obj in objs]
+    # bounding box corners of all objects are transformed with one stacked multiply
+    box_objs = [obj for obj, v in zip(objs, vert_mode) if not v]
+    if box_objs:
+        corners = np.array([_localBoundBox(obj, use_adaptive_domain) for obj in box_objs], dtype=np.float64)
+        if not local:
+            mats = np.array([obj.matrix_world for obj in box_objs], dtype=np.float64)
+            corners = corners @ mats[:, :3, :3].transpose(0, 2, 1) + mats[:, None, :3, 3]
+        box_points = iter(corners)
+    points = []
+    for obj, v in zip(objs, vert_mode):
+        if not v:
+            points.append(next(box_points))
+            continue
+        co = getVertexCoords(obj)
+        if not local:
+            transformPoints(co, obj.matrix_world, out=co)
+        points.append(co)
+    return points
+
+
+def boundsMulti(objs:iter, local:bool=False, union:bool=False, use_vertices:bool=False, use_adaptive_domain:bool=True):
+    """
+    returns list of bounds() details for objects in one pass, or single details of their union
+
+    bounds are computed from the bounding box corners, or from the mesh vertices if 'use_vertices' (tighter for rotated objects)
+    """
+    points = getObjectPoints(objs, local, use_vertices, use_adaptive_domain)
+    if not points:
+        return None if union else []
+    if union:
+        all_points = np.concatenate(points)
+        return _boundsInfo(all_points.min(axis=0), all_points.max(axis=0))
+    return [_boundsInfo(p.min(axis=0), p.max(axis=0)) for p in points]
+
+
 def bounds(obj:Object, local:bool=False, use_adaptive_domain:bool=True):
     """
     returns object details with the following subattribute Vectors:
@@ -103,27 +153,7 @@ def bounds(obj:Object, local:bool=False, use_adaptive_domain:bool=True):
     .dist: distance min to max
 
     """
-
-    local_coords = getBoundsBF(obj) if is_smoke(obj) and is_adaptive(obj) and not use_adaptive_domain else obj.bound_box[:]
-    om = obj.matrix_world
-
-    if not local:
-        worldify = lambda p: mathutils_mult(om, Vector(p[:]))
-        coords = [worldify(p).to_tuple() for p in local_coords]
-    else:
-        coords = [p[:] for p in local_coords]
-
-    rotated = zip(*coords[::-1])
-    getMax = lambda i: max([co[i] for co in coords])
-    getMin = lambda i: min([co[i] for co in coords])
-
-    info = lambda: None
-    info.max = Vector((getMax(0), getMax(1), getMax(2)))
-    info.min = Vector((getMin(0), getMin(1), getMin(2)))
-    info.mid = (info.min + info.max) / 2
-    info.dist = info.max - info.min
-
-    return info
+    return boundsMulti([obj], local=local, use_adaptive_domain=use_adaptive_domain)[0]
 
 
 def setObjOrigin(obj:Object, loc:Vector):
@@ -154,7 +184,8 @@ def transformToWorld(vec:Vector, mat:Matrix, junk_bme:bmesh=None):
         bmesh.ops.rotate(junk_bme, verts=[v1], cent=-loc, matrix=Matrix.Rotation(rot.x, 3, 'X'))
         bmesh.ops.rotate(junk_bme, verts=[v1], cent=-loc, matrix=Matrix.Rotation(rot.y, 3, 'Y'))
         bmesh.ops.rotate(junk_bme, verts=[v1], cent=-loc, matrix=Matrix.Rotation(rot.z, 3, 'Z'))
-        vec = v1.co
+        vec = v1.co.copy()
+        junk_bme.verts.remove(v1)
     # apply scale
     vec = vec * scale
     # apply translation
@@ -177,5 +208,27 @@ def transformToLocal(vec:Vector, mat:Matrix, junk_bme:bmesh=None):
         bmesh.ops.rotate(junk_bme, verts=[v1], cent=loc, matrix=Matrix.Rotation(-rot.z, 3, 'Z'))
         bmesh.ops.rotate(junk_bme, verts=[v1], cent=loc, matrix=Matrix.Rotation(-rot.y, 3, 'Y'))
         bmesh.ops.rotate(junk_bme, verts=[v1], cent=loc, matrix=Matrix.Rotation(-rot.x, 3, 'X'))
-        vec = v1.co
+        vec = v1.co.copy()
+        junk_bme.verts.remove(v1)
     return vec
+
+
+def transformPoints(points:np.ndarray, mat:Matrix, out:np.ndarray=None):
+    """ transform (N, 3) array of points by 4x4 matrix in one multiply ('out' may be 'points' to transform in place) """
+    m = np.asarray(mat, dtype=np.float64)
+    points = np.asarray(points)
+    if out is None:
+        out = np.empty(points.shape, dtype=np.result_type(points.dtype, np.float32))
+    np.matmul(points, m[:3, :3].T, out=out)
+    out += m[:3, 3]
+    return out
+
+
+def transformPointsToWorld(points:np.ndarray, mat:Matrix, out:np.ndarray=None):
+    """ transform (N, 3) array of points to world space from 'mat' matrix local space """
+    return transformPoints(points, mat, out)
+
+
+def transformPointsToLocal(points:np.ndarray, mat:Matrix, out:np.ndarray=None):
+    """ transform (N, 3) array of points to local space of 'mat' matrix """
+    return transformPoints(points, np.linalg.inv(np.asarray(mat, dtype=np.float64)), out)
@@ -0,0 +1,149 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Record modal operator event streams to JSONL files and replay them without a user
+
+Record by running 'scene.position_default_camera' with 'record_path' set, then replay, e.g.:
+    blender --background --python-expr "import default_scene.functions.event_replay as r; r.replayFile('/tmp/events.jsonl')"
+"""
+
+# System imports
+import json
+import time
+from types import SimpleNamespace
+
+# Blender imports
+# NONE!
+
+# Addon imports
+from .useractions import Actions
+
+
+# modifier attribute -> bit of the 'mods' field
+EVENT_MODIFIERS = ("ctrl", "shift", "alt", "oskey")
+
+
+class StandInEvent:
+    """ minimal stand-in for bpy.types.Event ('time' is seconds since recording started) """
+    __slots__ = ("type", "value", "mouse_region_x", "mouse_region_y", "ctrl", "shift", "alt", "oskey", "time")
+
+    def __init__(self, type:str, value:str="NOTHING", x:int=0, y:int=0, ctrl:bool=False, shift:bool=False, alt:bool=False, oskey:bool=False, time:float=0.0):
+        self.type, self.value = type, value
+        self.mouse_region_x, self.mouse_region_y = x, y
+        self.ctrl, self.shift, self.alt, self.oskey = ctrl, shift, alt, oskey
+        self.time = time
+
+
+class EventRecorder:
+    """ write events to JSONL file, one compact record per line """
+
+    def __init__(self, path:str):
+        self.path = path
+        self._file = open(path, "w")
+        self._start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def record(self, event):
+        mods = sum(1 << i for i, attr in enumerate(EVENT_MODIFIERS) if getattr(event, attr))
+        rec = {"t":round(time.perf_counter() - self._start, 6), "type":event.type, "value":event.value,
+               "x":event.mouse_region_x, "y":event.mouse_region_y, "mods":mods}
+        self._file.write(json.dumps(rec, separators=(",", ":")) + "\n")
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def readEvents(path:str):
+    """ read recorded events as list of StandInEvent """
+    events = []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            mods = rec.get("mods", 0)
+            events.append(StandInEvent(rec["type"], rec.get("value", "NOTHING"), rec.get("x", 0), rec.get("y", 0),
+                                       *(bool(mods & 1 << i) for i in range(len(EVENT_MODIFIERS))), time=rec.get("t", 0.0)))
+    return events
+
+
+def getStandInContext(width:int=1920, height:int=1080):
+    """ context stand-in with a region of the given size (background mode has no regions) """
+    return SimpleNamespace(region=SimpleNamespace(width=width, height=height, x=0, y=0), space_data=None, window=None)
+
+
+def getLatencyPercentiles(latencies:list, percentiles:iter=(50, 90, 99, 100)):
+    """ get {percentile: seconds} of per-event latencies """
+    if not latencies:
+        return {p:0.0 for p in percentiles}
+    ordered = sorted(latencies)
+    return {p:ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in percentiles}
+
+
+def printLatencies(label:str, latencies:list):
+    pcts = getLatencyPercentiles(latencies)
+    details = ", ".join("p%d %.2f us" % (p, t * 1e6) for p, t in pcts.items())
+    print("%(label)s: %(n)d events, %(details)s" % {"label":label, "n":len(latencies), "details":details})
+    return pcts
+
+
+def replayActions(events:list, context=None, actions:Actions=None):
+    """ feed events through Actions.update and Actions.navigating, returns per-event latencies (seconds) """
+    context = context or getStandInContext()
+    actions = actions or Actions(context, {})
+    latencies = []
+    for event in events:
+        start = time.perf_counter()
+        actions.update(context, event)
+        actions.navigating()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def replayModal(modal, events:list, context=None, op=None, coalesce_events:bool=True, frame_budget:float=1000 / 60):
+    """ feed events through operator 'modal' function until it finishes, returns per-event latencies (seconds) """
+    context = context or getStandInContext()
+    # stand-in operator: camera positioning only needs its actions, settings and end methods
+    op = op or SimpleNamespace(actions=Actions(context, {}), recorder=None,
+                               coalesce_events=coalesce_events, frame_budget=frame_budget, last_move_time=float("-inf"), pending_move=None,
+                               event_time=lambda event: event.time,
+                               end_commit=lambda: {"FINISHED"}, end_cancel=lambda: {"CANCELLED"})
+    latencies = []
+    for event in events:
+        start = time.perf_counter()
+        ret = modal(op, context, event)
+        latencies.append(time.perf_counter() - start)
+        if "FINISHED" in ret or "CANCELLED" in ret:
+            break
+    return latencies
+
+
+def replayFile(path:str, iterations:int=1):
+    """ replay recorded events through Actions and the camera positioning modal and print latency percentiles """
+    from ..buttons.position_default_camera import SCENE_OT_position_default_camera
+    events = readEvents(path)
+    for i in range(iterations):
+        printLatencies("Actions.update", replayActions(events))
+        printLatencies("position_default_camera.modal", replayModal(SCENE_OT_position_default_camera.modal, events, coalesce_events=False))
+        printLatencies("position_default_camera.modal (coalesced)", replayModal(SCENE_OT_position_default_camera.modal, events))
@@ -0,0 +1,98 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# System imports
+import numpy as np
+
+# Blender imports
+import bpy
+from mathutils import Matrix, Vector
+from bpy.types import Object
+
+# Addon imports
+from .common import *
+from .general import getRenderResolution, getCameraTanHalfFOV
+
+
+def getWorldPoints(objs:iter, use_vertices:bool=True):
+    """ get (N, 3) array of world space points bounding objects (mesh vertices, or bounding box corners) """
+    points = getObjectPoints(objs, use_vertices=use_vertices)
+    return np.concatenate(points) if points else np.empty((0, 3))
+
+
+def solveFraming(points:np.ndarray, rot:np.ndarray, tan_x:float, tan_y:float, fraction:float=0.8, ortho:bool=False):
+    """
+    place camera with orientation 'rot' (3x3, camera looks down its -Z axis) so all points fit in
+    'fraction' of the frame, returns dict with 'location', 'near', 'far' and 'ortho_scale'
+
+    per image axis, a point (u, z) in camera space is visible at lateral shift s and distance d if
+    |u - s| <= t * (d - z); the smallest d satisfying all points is (A + B) / 2 at s = t * (A - B) / 2,
+    with A = max(u / t + z) and B = max(-u / t + z)
+    """
+    center = (points.min(axis=0) + points.max(axis=0)) / 2
+    # points in camera axes, relative to their bounding box center
+    q = (points - center) @ rot
+    x, y, z = q[:, 0], q[:, 1], q[:, 2]
+    if ortho:
+        sx = (x.min() + x.max()) / 2
+        sy = (y.min() + y.max()) / 2
+        # 'tan_x'/'tan_y' are the half extents of the frame per unit ortho scale here
+        ortho_scale = max((x.max() - x.min()) / (2 * tan_x), (y.max() - y.min()) / (2 * tan_y), 1e-3) / fraction
+        # distance only needs to keep the subject in front of the camera
+        d = z.max() + ortho_scale
+    else:
+        tx, ty = tan_x * fraction, tan_y * fraction
+        ax, bx = (x / tx + z).max(), (-x / tx + z).max()
+        ay, by = (y / ty + z).max(), (-y / ty + z).max()
+        sx, sy = tx * (ax - bx) / 2, ty * (ay - by) / 2
+        d = max((ax + bx) / 2, (ay + by) / 2)
+        ortho_scale = None
+    depth = d - z
+    return {
+        "location": center + rot @ np.array((sx, sy, d)),
+        "near": float(depth.min()),
+        "far": float(depth.max()),
+        "ortho_scale": ortho_scale,
+    }
+
+
+def frameCamera(cam_ob:Object, objs:iter, fraction:float=0.8, scn=None, use_vertices:bool=True):
+    """ move camera (keeping its orientation) so objects fill 'fraction' of the frame and fit its clipping range to them """
+    scn = scn or bpy.context.scene
+    points = getWorldPoints(objs, use_vertices)
+    if len(points) == 0:
+        return False
+    cam = cam_ob.data
+    res_x, res_y = getRenderResolution(scn)
+    rot = np.array(cam_ob.matrix_world.to_3x3().normalized(), dtype=np.float64)
+    ortho = cam.type == "ORTHO"
+    if ortho:
+        # ortho scale spans the larger render dimension
+        aspect = res_y / res_x
+        tan_x, tan_y = (0.5, 0.5 * aspect) if res_x >= res_y else (0.5 / aspect, 0.5)
+    else:
+        tan_x, tan_y = getCameraTanHalfFOV(cam, res_x, res_y)
+    solve = solveFraming(points, rot, tan_x, tan_y, fraction, ortho)
+    loc = Vector(solve["location"].tolist())
+    cam_ob.matrix_world = mathutils_mult(Matrix.Translation(loc), cam_ob.matrix_world.to_3x3().normalized().to_4x4())
+    if ortho:
+        cam.ortho_scale = solve["ortho_scale"]
+    # keep some depth range in front of and behind the subject
+    near, far = solve["near"], solve["far"]
+    cam.clip_start = max(near * 0.5, 1e-3)
+    cam.clip_end = max(far * 2, cam.clip_start * 10)
+    return True
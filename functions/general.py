@@ -15,9 +15,16 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+# System imports
+import math
+
 # Blender imports
 import bpy
 
+# Addon imports
+from .common import *
+from .rig_registry import *
+
 def isBrickerInstalled():
     return hasattr(bpy.context.scene, "isBrickerInstalled")
 
@@ -28,9 +35,32 @@ def setLockCameraToView(value:bool=True):
             area.spaces[0].lock_camera = value
 
 
-def enableDefaultCamera():
-    cam_ob = bpy.data.objects.get("Default_Scene_camera_object")
+def getRenderResolution(scn):
+    """ get final render resolution in pixels (accounts for resolution percentage) """
+    pct = scn.render.resolution_percentage / 100
+    return max(1, round(scn.render.resolution_x * pct)), max(1, round(scn.render.resolution_y * pct))
+
+
+def getCameraTanHalfFOV(cam, res_x:int, res_y:int):
+    """ get tangents of half the horizontal and vertical field of view of perspective camera data """
+    fit = cam.sensor_fit
+    if fit == "AUTO":
+        sensor = cam.sensor_width
+        fit = "HORIZONTAL" if res_x >= res_y else "VERTICAL"
+    else:
+        sensor = cam.sensor_width if fit == "HORIZONTAL" else cam.sensor_height
+    tan_half = sensor / (2 * cam.lens)
+    if fit == "HORIZONTAL":
+        return tan_half, tan_half * res_y / res_x
+    else:
+        return tan_half * res_x / res_y, tan_half
+
+
+def enableDefaultCamera(scn=None):
+    scn = scn or bpy.context.scene
+    cam_ob = getRigObject(CAMERA_ROLE, scn)
     if cam_ob is not None:
-        link_object(cam_ob)
-        select(cam_ob, active=cam_ob)
+        if scn not in cam_ob.users_scene:
+            linkRigObject(cam_ob, scn)
+        select(cam_ob, active=True)
         scn.camera = cam_ob
@@ -0,0 +1,540 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# System imports
+import os
+import math
+import json
+import hashlib
+import tempfile
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Blender imports
+import bpy
+from bpy.app.handlers import persistent
+
+# Addon imports
+from .common import *
+from .general import getRenderResolution, getCameraTanHalfFOV
+from .rig_registry import getRigObject, CAMERA_ROLE
+
+
+HDRI_RESOLUTIONS = ("1k", "2k", "4k", "8k", "16k")
+HDRI_PREVIEW_RESOLUTION = "1k"
+# used when the world is only seen through lighting and reflections
+HDRI_LIGHTING_RESOLUTION = "2k"
+# 'AUTO' never picks more than this (16k maps take four times the memory, select them explicitly)
+HDRI_AUTO_MAX_RESOLUTION = "8k"
+HDRI_FILTERS = ("BOX", "LANCZOS")
+
+# Lanczos-3 weights for halving resolution (taps centered between the two source texels)
+_LANCZOS_TAPS = np.arange(-5, 7) - 0.5
+_LANCZOS_WEIGHTS = np.sinc(_LANCZOS_TAPS / 2) * np.sinc(_LANCZOS_TAPS / 6)
+_LANCZOS_WEIGHTS = (_LANCZOS_WEIGHTS / _LANCZOS_WEIGHTS.sum()).astype(np.float32)
+
+# scene name -> (HDRI resolution, filter, memory budget) waiting to be swapped in by '_swapInPendingHDRIs'
+_pending_hdris = {}
+# (clamped HDRI resolution, filter) -> future of '_decodeHDRI' running on '_hdri_decoder'
+_hdri_decodes = {}
+# worker thread decoding HDRI maps off the UI thread (created on first use)
+_hdri_decoder = None
+# names of HDRI images loaded by this addon, least recently used first
+_resident_hdris = OrderedDict()
+# owner of msgbus subscriptions that update 'AUTO' HDRI resolution
+_auto_hdri_owner = object()
+
+
+def getHDRIName(res:str):
+    """ get file/image name of HDRI at given resolution """
+    return "studio_small_01_{res}.hdr".format(res=res)
+
+
+def getHDRIPath(res:str):
+    """ get filepath of HDRI at given resolution """
+    return os.path.join(get_addon_directory(), "textures", getHDRIName(res))
+
+
+def getHDRIWidth(res:str):
+    """ get width in texels of equirectangular HDRI at given resolution """
+    return int(res[:-1]) * 1024
+
+
+def getAutoHDRIResolution(scn):
+    """ get smallest HDRI resolution providing the texel density seen through the scene camera """
+    cam_ob = scn.camera or getRigObject(CAMERA_ROLE, scn)
+    if cam_ob is None or cam_ob.type != "CAMERA":
+        return HDRI_AUTO_MAX_RESOLUTION
+    cam = cam_ob.data
+    # orthographic cameras see a single direction of the world, transparent film hides it
+    if cam.type == "ORTHO" or getattr(scn.render, "film_transparent", False):
+        return HDRI_LIGHTING_RESOLUTION
+    if cam.type == "PANO":
+        return HDRI_AUTO_MAX_RESOLUTION
+    res_x, res_y = getRenderResolution(scn)
+    tan_x, tan_y = getCameraTanHalfFOV(cam, res_x, res_y)
+    # angular density is highest at image center: res_x / (2 * tan_x) pixels per radian
+    width = math.pi * max(res_x / tan_x, res_y / tan_y)
+    for res in HDRI_RESOLUTIONS[:HDRI_RESOLUTIONS.index(HDRI_AUTO_MAX_RESOLUTION)]:
+        if getHDRIWidth(res) >= width:
+            return res
+    return HDRI_AUTO_MAX_RESOLUTION
+
+
+def resolveHDRIResolution(scn):
+    """ get HDRI resolution for scene ('AUTO' is resolved from camera and render settings) """
+    return getAutoHDRIResolution(scn) if scn.hdri_resolution == "AUTO" else scn.hdri_resolution
+
+
+def getSourceHDRI():
+    """ get resolution and path of largest HDRI in the textures folder """
+    for res in reversed(HDRI_RESOLUTIONS):
+        path = getHDRIPath(res)
+        if os.path.exists(path):
+            return res, path
+    return None, None
+
+
+def clampHDRIResolution(res:str):
+    """ clamp resolution to largest available source (levels are never upsampled) """
+    src_res, _ = getSourceHDRI()
+    if src_res is not None and HDRI_RESOLUTIONS.index(res) > HDRI_RESOLUTIONS.index(src_res):
+        return src_res
+    return res
+
+
+def getHDRICacheDirectory():
+    """ get directory for generated HDRI levels (falls back to temp dir if addon dir is read-only) """
+    cache_dir = os.path.join(get_addon_directory(), "textures", "cache")
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.access(cache_dir, os.W_OK):
+            return cache_dir
+    except OSError:
+        pass
+    cache_dir = os.path.join(tempfile.gettempdir(), "default_scene_hdri_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def hashSourceHDRI(path:str, cache_dir:str, compute:bool=True):
+    """ get md5 digest and mtime of source file (digests are stored in cache index keyed by size/mtime, None if not indexed and not computed) """
+    st = os.stat(path)
+    key = "%(path)s|%(size)d|%(mtime)d" % {"path":path, "size":st.st_size, "mtime":st.st_mtime_ns}
+    index_path = os.path.join(cache_dir, "index.json")
+    try:
+        with open(index_path, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    if key not in index:
+        if not compute:
+            return None, st.st_mtime_ns
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                md5.update(chunk)
+        index[key] = md5.hexdigest()
+        with open(index_path, "w") as f:
+            json.dump(index, f)
+    return index[key], st.st_mtime_ns
+
+
+def _lanczosHalve(arr:np.ndarray, axis:int, pad_mode:str):
+    """ halve resolution of array along axis with separable Lanczos-3 filter """
+    n_out = arr.shape[axis] // 2
+    pad = [(0, 0)] * arr.ndim
+    pad[axis] = (5, 6)
+    padded = np.pad(arr, pad, mode=pad_mode)
+    shape = list(arr.shape)
+    shape[axis] = n_out
+    out = np.zeros(shape, dtype=np.float32)
+    sl = [slice(None)] * arr.ndim
+    for k, weight in enumerate(_LANCZOS_WEIGHTS):
+        sl[axis] = slice(k, k + 2 * n_out, 2)
+        out += weight * padded[tuple(sl)]
+    return out
+
+
+def downsample2x(arr:np.ndarray, method:str="BOX"):
+    """ halve resolution of (h, w, c) float32 equirectangular image """
+    if method == "LANCZOS":
+        # equirectangular maps wrap horizontally; clamp at the poles
+        arr = _lanczosHalve(arr, axis=0, pad_mode="edge")
+        arr = _lanczosHalve(arr, axis=1, pad_mode="wrap")
+        # negative lobes can ring below zero next to very bright texels
+        return np.maximum(arr, 0, out=arr)
+    h, w = arr.shape[0] // 2, arr.shape[1] // 2
+    return arr[:h * 2, :w * 2].reshape(h, 2, w, 2, -1).mean(axis=(1, 3), dtype=np.float32)
+
+
+def readHalvedHDRI(path:str, method:str="BOX", block_rows:int=256):
+    """ read HDRI at half resolution as (h, w, 3) float32 array (box filter streams the file in blocks) """
+    with RGBEImage(path) as im:
+        if method != "BOX" or im.bottom_up or im.height % 2:
+            return downsample2x(im.read(), method)
+        # full resolution float image is never held in memory
+        out = np.empty((im.height // 2, im.width // 2, 3), dtype=np.float32)
+        for y, block in im.iterBlocks(block_rows):
+            half = downsample2x(block, method)
+            out[y // 2:y // 2 + len(half)] = half
+        return out
+
+
+def getHDRIPyramidPaths(src_res:str, src_path:str, method:str="BOX", compute_digest:bool=True, cache_dir:str=None):
+    """ get res -> path of HDRI levels generated from source file (only the source if its digest is unknown and not computed) """
+    cache_dir = cache_dir or getHDRICacheDirectory()
+    digest, mtime = hashSourceHDRI(src_path, cache_dir, compute_digest)
+    paths = {}
+    if digest is not None:
+        for res in HDRI_RESOLUTIONS[:HDRI_RESOLUTIONS.index(src_res)]:
+            paths[res] = os.path.join(cache_dir, "studio_small_01_%(res)s_%(method)s_%(digest)s_%(mtime)d.hdr" % {"res":res, "method":method.lower(), "digest":digest[:16], "mtime":mtime})
+    paths[src_res] = src_path
+    return paths
+
+
+def buildHDRIPyramid(src_res:str, src_path:str, method:str="BOX", cache_dir:str=None):
+    """ generate HDRI levels below 'src_res' from source file (cached on disk), returns res -> path """
+    paths = getHDRIPyramidPaths(src_res, src_path, method, cache_dir=cache_dir)
+    levels = HDRI_RESOLUTIONS[:HDRI_RESOLUTIONS.index(src_res)]
+    missing = [res for res in levels if not os.path.exists(paths[res])]
+    if missing:
+        level = None
+        for res in reversed(levels):
+            level = readHalvedHDRI(src_path, method) if level is None else downsample2x(level, method)
+            if res in missing:
+                writeRGBE(paths[res], level)
+    return paths
+
+
+def getAvailableHDRIPaths(method:str="BOX"):
+    """ get res -> path of HDRI maps available without generating any (shipped maps and levels cached on disk) """
+    paths = {}
+    src_res, src_path = getSourceHDRI()
+    if src_path is not None:
+        paths.update((res, path) for res, path in getHDRIPyramidPaths(src_res, src_path, method, compute_digest=False).items() if os.path.exists(path))
+    paths.update((res, getHDRIPath(res)) for res in HDRI_RESOLUTIONS if os.path.exists(getHDRIPath(res)))
+    return paths
+
+
+def getEnvTexNode(scn):
+    """ get environment texture node created by default scene setup (None if the world is linked and can't be edited) """
+    if scn.world is None or scn.world.library is not None or scn.world.node_tree is None:
+        return None
+    return scn.world.node_tree.nodes.get("Default World Texture")
+
+
+def openHDRI(res:str, method:str="BOX", build:bool=True):
+    """
+    get HDRI image datablock at given resolution (opens file if necessary, pixels are decoded lazily)
+
+    without 'build', missing levels are not generated and the closest available map is opened instead (None if there is none)
+    """
+    res = clampHDRIResolution(res)
+    path = getHDRIPath(res)
+    if not os.path.exists(path):
+        if build:
+            # only the largest map needs to be shipped, smaller levels are generated from it
+            src_res, src_path = getSourceHDRI()
+            if src_path is not None:
+                path = buildHDRIPyramid(src_res, src_path, method)[res]
+        else:
+            available = getAvailableHDRIPaths(method)
+            if not available:
+                return None
+            if res not in available:
+                res = min(available, key=lambda r: abs(HDRI_RESOLUTIONS.index(r) - HDRI_RESOLUTIONS.index(res)))
+            path = available[res]
+    name = getHDRIName(res)
+    im = bpy.data.images.get(name)
+    if im is None:
+        im = bpy.data.images.load(path, check_existing=True)
+        im.name = name
+    elif os.path.normpath(bpy.path.abspath(im.filepath)) != os.path.normpath(path):
+        # generated level with a different filter (setting filepath reloads the image)
+        if im.source != "FILE":
+            im.source = "FILE"
+        im.filepath = path
+    _resident_hdris[im.name] = None
+    _resident_hdris.move_to_end(im.name)
+    return im
+
+
+def isHDRIDecoded(res:str):
+    """ check if pixels of HDRI at given resolution are already in memory """
+    im = bpy.data.images.get(getHDRIName(clampHDRIResolution(res)))
+    return im is not None and im.has_data
+
+
+def decodeHDRIPixels(path:str, block_rows:int=256):
+    """ decode HDRI file without a datablock, returns (width, height, flat RGBA float32 pixels in Blender's bottom-up row order) """
+    with RGBEImage(path) as hdr:
+        pixels = np.empty((hdr.height, hdr.width, 4), dtype=np.float32)
+        pixels[..., 3] = 1
+        rows = pixels[::-1]
+        for y, block in hdr.iterBlocks(block_rows):
+            rows[y:y + len(block), :, :3] = block
+        return hdr.width, hdr.height, pixels.ravel()
+
+
+def _decodeHDRI(res:str, path:str, src_res:str, src_path:str, method:str, cache_dir:str):
+    """ worker thread: generate missing HDRI levels (if 'cache_dir' is set) and decode map at 'res', returns (path, width, height, pixels) """
+    # never touches bpy, paths were resolved by '_submitHDRIDecode'
+    if cache_dir is not None:
+        path = buildHDRIPyramid(src_res, src_path, method, cache_dir)[res]
+    return (path,) + decodeHDRIPixels(path)
+
+
+def _submitHDRIDecode(res:str, method:str="BOX"):
+    """ start decoding HDRI at (clamped) resolution in the background unless it is already being decoded, returns future """
+    global _hdri_decoder
+    key = (res, method)
+    if key in _hdri_decodes:
+        return _hdri_decodes[key]
+    # drop maps decoded for requests that were canceled since
+    for other_key, future in list(_hdri_decodes.items()):
+        if future.done():
+            del _hdri_decodes[other_key]
+    if _hdri_decoder is None:
+        _hdri_decoder = ThreadPoolExecutor(max_workers=1)
+    path = getHDRIPath(res)
+    src_res, src_path = getSourceHDRI()
+    cache_dir = None if os.path.exists(path) or src_path is None else getHDRICacheDirectory()
+    _hdri_decodes[key] = _hdri_decoder.submit(_decodeHDRI, res, path, src_res, src_path, method, cache_dir)
+    return _hdri_decodes[key]
+
+
+def _pushDecodedHDRI(res:str, future):
+    """ copy pixels decoded in the background into HDRI image datablock, returns image (None if decoding failed) """
+    try:
+        path, width, height, pixels = future.result()
+    except (OSError, ValueError) as e:
+        print("Default Scene: could not load %(res)s HDRI (%(e)s)" % locals())
+        return None
+    name = getHDRIName(res)
+    im = bpy.data.images.get(name)
+    # generated images take pixels without reading their file on the UI thread
+    if im is None:
+        im = bpy.data.images.new(name, width, height, alpha=False, float_buffer=True)
+    else:
+        im.source = "GENERATED"
+        im.generated_width, im.generated_height = width, height
+        im.use_generated_float = True
+    # file pixels are read from again after 'releaseHDRI' or when the .blend is reopened
+    im.filepath_raw = path
+    im.pixels.foreach_set(pixels)
+    _resident_hdris[im.name] = None
+    _resident_hdris.move_to_end(im.name)
+    return im
+
+
+def releaseHDRI(im):
+    """ free pixels of HDRI image (images filled by the background decoder read their file again on next use) """
+    if im.source == "GENERATED" and im.filepath_raw:
+        im.source = "FILE"
+    im.buffers_free()
+
+
+def getImageMemory(im):
+    """ get number of bytes used by image pixels currently in memory """
+    if not im.has_data:
+        return 0
+    w, h = im.size
+    return w * h * im.channels * (4 if im.is_float else 1)
+
+
+def getResidentHDRIs():
+    """ get HDRI images loaded by this addon, least recently used first """
+    # pick up HDRIs loaded in a previous session as least recently used
+    for res in HDRI_RESOLUTIONS:
+        name = getHDRIName(res)
+        if name not in _resident_hdris and name in bpy.data.images:
+            _resident_hdris[name] = None
+            _resident_hdris.move_to_end(name, last=False)
+    ims = []
+    for name in list(_resident_hdris):
+        im = bpy.data.images.get(name)
+        if im is None:
+            del _resident_hdris[name]
+        else:
+            ims.append(im)
+    return ims
+
+
+def getHDRIMemory():
+    """ get number of bytes used by HDRI images loaded by this addon (doesn't change residency, safe to call while drawing) """
+    names = set(_resident_hdris).union(getHDRIName(res) for res in HDRI_RESOLUTIONS)
+    ims = [bpy.data.images.get(name) for name in names]
+    return sum(getImageMemory(im) for im in ims if im is not None)
+
+
+def getWorldHDRIs():
+    """ get names of images used by environment texture nodes of any world """
+    names = set()
+    for world in bpy.data.worlds:
+        if world.node_tree is None:
+            continue
+        for node in world.node_tree.nodes:
+            if node.type == "TEX_ENVIRONMENT" and node.image is not None:
+                names.add(node.image.name)
+    return names
+
+
+def enforceHDRIBudget(budget:int=None):
+    """ remove unused HDRI images, then free pixels of images no world uses (least recently used first) until memory use fits budget """
+    for im in getResidentHDRIs():
+        if im.users == 0:
+            del _resident_hdris[im.name]
+            bpy.data.images.remove(im)
+    if budget is None:
+        return
+    ims = getResidentHDRIs()
+    total = sum(getImageMemory(im) for im in ims)
+    # images attached to any scene's world stay in memory
+    in_use = getWorldHDRIs()
+    for im in ims:
+        if total <= budget:
+            break
+        if im.name in in_use:
+            continue
+        mem = getImageMemory(im)
+        if mem:
+            releaseHDRI(im)
+            total -= mem
+
+
+def detachHDRIs(scn):
+    """ remove environment texture node from scene world, returns HDRI images left without users """
+    envTexNode = getEnvTexNode(scn)
+    if envTexNode is not None:
+        _pending_hdris.pop(scn.name, None)
+        scn.world.node_tree.nodes.remove(envTexNode)
+    ims = [im for im in getResidentHDRIs() if im.users == 0]
+    for im in ims:
+        del _resident_hdris[im.name]
+    return ims
+
+
+def setHDRI(scn, res:str, progressive:bool=False, method:str="BOX", budget:int=None):
+    """ set HDRI image of environment texture node (optionally shows low resolution version first) """
+    envTexNode = getEnvTexNode(scn)
+    if envTexNode is None:
+        return
+    _pending_hdris.pop(scn.name, None)
+    if not progressive or isHDRIDecoded(res) or not hasattr(bpy.app, "timers"):
+        im = openHDRI(res, method)
+        if envTexNode.image != im:
+            envTexNode.image = im
+        enforceHDRIBudget(budget)
+        return
+    # attach low resolution map right away (or the closest one available, missing levels are generated by the timer)
+    im = openHDRI(HDRI_PREVIEW_RESOLUTION, method, build=False)
+    if im is not None and envTexNode.image != im:
+        envTexNode.image = im
+    enforceHDRIBudget(budget)
+    if im is not None and im.name == getHDRIName(clampHDRIResolution(res)):
+        return
+    # decode the requested map in the background, the timer swaps it in once it is done
+    _pending_hdris[scn.name] = (res, method, budget)
+    _submitHDRIDecode(clampHDRIResolution(res), method)
+    if not bpy.app.timers.is_registered(_swapInPendingHDRIs):
+        bpy.app.timers.register(_swapInPendingHDRIs, first_interval=0.05)
+
+
+def suspendPendingHDRI(scn):
+    """ cancel queued HDRI swap of scene, returns request for 'resumePendingHDRI' (None if nothing was queued) """
+    return _pending_hdris.pop(scn.name, None)
+
+
+def resumePendingHDRI(scn, request:tuple):
+    """ queue HDRI swap returned by 'suspendPendingHDRI' again (unless another one was queued or the resolution changed since) """
+    res, method, budget = request
+    if scn.name in _pending_hdris or resolveHDRIResolution(scn) != res:
+        return
+    setHDRI(scn, res, progressive=True, method=method, budget=budget)
+
+
+def _swapInPendingHDRIs():
+    """ timer callback: push HDRIs decoded in the background into their images and attach them to the scenes waiting for them """
+    waiting = {}
+    for scn_name, (res, method, budget) in _pending_hdris.items():
+        waiting.setdefault((clampHDRIResolution(res), method), []).append(scn_name)
+    for key, future in list(_hdri_decodes.items()):
+        if key not in waiting:
+            # a decode nobody waits for anymore is only canceled if it hasn't started yet
+            if future.cancel():
+                del _hdri_decodes[key]
+            continue
+        if not future.done():
+            continue
+        del _hdri_decodes[key]
+        im = _pushDecodedHDRI(key[0], future)
+        for scn_name in waiting[key]:
+            res, method, budget = _pending_hdris.pop(scn_name)
+            scn = bpy.data.scenes.get(scn_name)
+            envTexNode = None if scn is None or im is None else getEnvTexNode(scn)
+            # skip requests made stale by scene deletion or another resolution change
+            if envTexNode is not None and resolveHDRIResolution(scn) == res:
+                envTexNode.image = im
+                enforceHDRIBudget(budget)
+        tag_redraw_viewport_in_all_screens()
+    return 0.05 if _pending_hdris else None
+
+
+def _updateAutoHDRIs():
+    """ timer callback: reload HDRI of scenes using 'AUTO' resolution """
+    for scn in bpy.data.scenes:
+        if scn.hdri_resolution == "AUTO" and getEnvTexNode(scn) is not None:
+            setHDRI(scn, getAutoHDRIResolution(scn), progressive=scn.ds_progressive_hdri, method=scn.ds_hdri_filter, budget=scn.ds_hdri_memory_budget * 1024 ** 2)
+    return None
+
+
+def _autoHDRIInputChanged(*args):
+    # debounce (dragging a resolution or lens slider notifies continuously)
+    if bpy.app.timers.is_registered(_updateAutoHDRIs):
+        bpy.app.timers.unregister(_updateAutoHDRIs)
+    bpy.app.timers.register(_updateAutoHDRIs, first_interval=0.5)
+
+
+def subscribeAutoHDRI():
+    """ update 'AUTO' HDRI resolution when render resolution or camera settings change """
+    bpy.msgbus.clear_by_owner(_auto_hdri_owner)
+    keys = [(bpy.types.RenderSettings, prop) for prop in ("resolution_x", "resolution_y", "resolution_percentage", "film_transparent")]
+    keys += [(bpy.types.Camera, prop) for prop in ("type", "lens", "sensor_width", "sensor_height", "sensor_fit")]
+    keys.append((bpy.types.Scene, "camera"))
+    for key in keys:
+        bpy.msgbus.subscribe_rna(key=key, owner=_auto_hdri_owner, args=(), notify=_autoHDRIInputChanged)
+
+
+def unsubscribeAutoHDRI():
+    bpy.msgbus.clear_by_owner(_auto_hdri_owner)
+
+
+@persistent
+def handle_reload_decoded_hdris(dummy):
+    # pixels pushed by the background decoder aren't saved with the .blend, read them from file again
+    for res in HDRI_RESOLUTIONS:
+        im = bpy.data.images.get(getHDRIName(res))
+        if im is not None and im.source == "GENERATED" and im.filepath_raw:
+            im.source = "FILE"
+
+
+@persistent
+def handle_subscribe_auto_hdri(dummy):
+    # msgbus subscriptions are cleared when a file is loaded
+    subscribeAutoHDRI()
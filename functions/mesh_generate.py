@@ -16,8 +16,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 # System imports
+import inspect
 import math
+import os
 import numpy as np
+from collections import OrderedDict
 
 # Blender imports
 import bpy
@@ -27,6 +30,374 @@ from mathutils import Matrix, Vector
 # Addon imports
 from .common import *
 
+
+class MeshArrays:
+    """
+    vertex and face index buffers of a generated mesh
+
+    verts      -- (V, 3) float32 vertex coordinates
+    loops      -- (L,) int32 vertex indices of all faces, one face after the other
+    face_sizes -- (F,) int32 number of vertices per face
+    smooth     -- (F,) bool smooth shading flag per face
+    edges      -- (E, 2) int32 vertex index pairs of loose edges (face edges are calculated)
+    """
+
+    def __init__(self, verts:np.ndarray, loops:np.ndarray=None, face_sizes:np.ndarray=None, smooth:np.ndarray=None, edges:np.ndarray=None):
+        self.verts = np.ascontiguousarray(verts, dtype=np.float32).reshape(-1, 3)
+        self.loops = np.zeros(0, dtype=np.int32) if loops is None else np.ascontiguousarray(loops, dtype=np.int32).ravel()
+        self.face_sizes = np.zeros(0, dtype=np.int32) if face_sizes is None else np.ascontiguousarray(face_sizes, dtype=np.int32).ravel()
+        self.smooth = np.zeros(len(self.face_sizes), dtype=bool) if smooth is None else np.ascontiguousarray(smooth, dtype=bool).ravel()
+        self.edges = np.zeros((0, 2), dtype=np.int32) if edges is None else np.ascontiguousarray(edges, dtype=np.int32).reshape(-1, 2)
+
+    @property
+    def face_starts(self):
+        """ index of first loop of each face """
+        starts = np.zeros(len(self.face_sizes), dtype=np.int32)
+        np.cumsum(self.face_sizes[:-1], out=starts[1:])
+        return starts
+
+    def copy(self):
+        """ get copy with writable arrays """
+        return MeshArrays(self.verts.copy(), self.loops.copy(), self.face_sizes.copy(), self.smooth.copy(), self.edges.copy())
+
+    def freeze(self):
+        """ make arrays read-only (so they can be shared) """
+        for arr in (self.verts, self.loops, self.face_sizes, self.smooth, self.edges):
+            arr.flags.writeable = False
+        return self
+
+    @property
+    def nbytes(self):
+        return self.verts.nbytes + self.loops.nbytes + self.face_sizes.nbytes + self.smooth.nbytes + self.edges.nbytes
+
+
+def faceArrays(*groups):
+    """ join face groups given as ((F, k) vertex index array, smooth) into (loops, face_sizes, smooth) buffers """
+    groups = [(np.asarray(faces, dtype=np.int32), smooth) for faces, smooth in groups]
+    groups = [(faces.reshape(-1, faces.shape[-1]) if faces.size else faces.reshape(0, 0), smooth) for faces, smooth in groups]
+    loops = np.concatenate([faces.ravel() for faces, _ in groups]) if groups else np.zeros(0, dtype=np.int32)
+    face_sizes = np.concatenate([np.full(len(faces), faces.shape[1], dtype=np.int32) for faces, _ in groups]) if groups else np.zeros(0, dtype=np.int32)
+    smooth = np.concatenate([np.full(len(faces), smooth, dtype=bool) for faces, smooth in groups]) if groups else np.zeros(0, dtype=bool)
+    return loops, face_sizes, smooth
+
+
+def _ring(r:float, N:int, z:float=0, co:Vector=Vector((0, 0, 0))):
+    """ (N, 3) coordinates of circle verts (counter-clockwise from +x) """
+    angles = np.arange(N) * (2 * math.pi / N)
+    ring = np.empty((N, 3), dtype=np.float64)
+    ring[:, 0] = r * np.cos(angles)
+    ring[:, 1] = r * np.sin(angles)
+    ring[:, 2] = z
+    ring += tuple(co)
+    return ring
+
+
+def _connectRings(ring1:np.ndarray, ring2:np.ndarray):
+    """ (N, 4) quads connecting two rings of vertex indices, ring1[i] -> ring1[i+1] -> ring2[i+1] -> ring2[i] """
+    return np.stack((ring1, np.roll(ring1, -1), np.roll(ring2, -1), ring2), axis=1)
+
+
+def cubeArrays(coord1:Vector, coord2:Vector, sides:list=[False]*6, flipNormals:bool=False):
+    """ array version of 'makeCube' (verts in x, y, z nested order: ---, --+, -+-, -++, +--, +-+, ++-, +++) """
+    xs, ys, zs = (coord1.x, coord2.x), (coord1.y, coord2.y), (coord1.z, coord2.z)
+    verts = [(x, y, z) for x in xs for y in ys for z in zs]
+    # [+z, -z, +x, -x, +y, -y]
+    side_faces = ((5, 7, 3, 1), (2, 6, 4, 0), (7, 5, 4, 6), (1, 3, 2, 0), (3, 7, 6, 2), (5, 1, 0, 4))
+    faces = np.array([side_faces[i] for i in (0, 1, 4, 3, 2, 5) if sides[i]], dtype=np.int32).reshape(-1, 4)
+    if flipNormals:
+        faces = faces[:, ::-1]
+    return MeshArrays(verts, *faceArrays((faces, False)))
+
+
+def circleArrays(r:float, N:int, co:Vector=Vector((0,0,0)), face:bool=True, flipNormals:bool=False):
+    """ array version of 'makeCircle' """
+    idx = np.arange(N)
+    faces = [((idx[::-1] if flipNormals else idx)[None], False)] if face else []
+    return MeshArrays(_ring(r, N, 0, co), *faceArrays(*faces))
+
+
+def cylinderArrays(r:float, h:float, N:int, co:Vector=Vector((0,0,0)), botFace:bool=True, topFace:bool=True, flipNormals:bool=False):
+    """ array version of 'makeCylinder' (top and bottom verts alternate: top 0, bottom 0, top 1, ...) """
+    verts = np.empty((2 * N, 3), dtype=np.float64)
+    verts[0::2] = _ring(r, N, h / 2, co)
+    verts[1::2] = _ring(r, N, -h / 2, co)
+    top, bot = np.arange(0, 2 * N, 2), np.arange(1, 2 * N, 2)
+    groups = [(_connectRings(top, bot) if flipNormals else _connectRings(bot, top), True)]
+    if topFace:
+        groups.append(((top[::-1] if flipNormals else top)[None], False))
+    if botFace:
+        groups.append(((bot if flipNormals else bot[::-1])[None], False))
+    return MeshArrays(verts, *faceArrays(*groups))
+
+
+def tubeArrays(r:float, h:float, t:float, N:int, co:Vector=Vector((0,0,0)), topFace:bool=True, botFace:bool=True):
+    """ array version of 'makeTube' (inner cylinder verts, then outer cylinder verts) """
+    inner = cylinderArrays(r, h, N, co, botFace=False, topFace=False, flipNormals=True)
+    outer = cylinderArrays(r + t, h, N, co, botFace=False, topFace=False)
+    top_in, bot_in = np.arange(0, 2 * N, 2), np.arange(1, 2 * N, 2)
+    top_out, bot_out = top_in + 2 * N, bot_in + 2 * N
+    groups = [(inner.loops.reshape(-1, 4), True), (outer.loops.reshape(-1, 4) + 2 * N, True)]
+    if topFace:
+        groups.append((_connectRings(top_out, top_in), False))
+    if botFace:
+        groups.append((_connectRings(bot_out[::-1], bot_in[::-1]), False))
+    return MeshArrays(np.concatenate((inner.verts, outer.verts)), *faceArrays(*groups))
+
+
+def coneArrays(r:float, N:int):
+    """ array version of 'makeCone' (apex first, then bottom circle) """
+    verts = np.concatenate((((0, 0, 1),), _ring(r, N, -1)))
+    ring = np.arange(1, N + 1)
+    sides = np.stack((ring, np.roll(ring, -1), np.zeros(N, dtype=np.int32)), axis=1)
+    # side faces start with the one closing the circle
+    sides = np.roll(sides, 1, axis=0)
+    return MeshArrays(verts, *faceArrays((ring[None], False), (sides, False)))
+
+
+def uvSphereArrays(r:float, V:int, H:int):
+    """ array version of 'makeUVSphere' (top pole, rings from top to bottom, bottom pole) """
+    i = np.arange(int(V / 4), int((3 * V) / 4) + 1)
+    angles = i * (2 * math.pi / V)
+    # profile in the xz plane, from top to bottom
+    px, pz = r * np.cos(angles), r * np.sin(angles)
+    ring_x, ring_z = px[1:-1], pz[1:-1]
+    n_rings = len(ring_x)
+    phi = np.arange(H) * (2 * math.pi / H)
+    rings = np.empty((n_rings, H, 3), dtype=np.float64)
+    rings[..., 0] = np.outer(ring_x, np.cos(phi))
+    rings[..., 1] = np.outer(ring_x, np.sin(phi))
+    rings[..., 2] = ring_z[:, None]
+    verts = np.concatenate((((px[0], 0, pz[0]),), rings.reshape(-1, 3), ((px[-1], 0, pz[-1]),)))
+    bot = len(verts) - 1
+    idx = np.arange(n_rings * H).reshape(n_rings, H) + 1
+    # quads (ring l, m), (ring l+1, m), (ring l+1, m+1), (ring l, m+1), starting at m = -1
+    a, b = np.roll(idx[:-1], 1, axis=1), np.roll(idx[1:], 1, axis=1)
+    quads = np.stack((a, b, np.roll(b, -1, axis=1), np.roll(a, -1, axis=1)), axis=2).reshape(-1, 4)
+    first, last = np.roll(idx[0], 1), np.roll(idx[-1], 1)
+    caps = np.empty((H, 2, 3), dtype=np.int32)
+    caps[:, 0] = np.stack((first, np.roll(first, -1), np.zeros(H, dtype=np.int32)), axis=1)
+    caps[:, 1] = np.stack((np.roll(last, -1), last, np.full(H, bot, dtype=np.int32)), axis=1)
+    return MeshArrays(verts, *faceArrays((quads, False), (caps.reshape(-1, 3), False)))
+
+
+def torusArrays(R:float, r:float, N:int, M:int, co:Vector=Vector((0,0,0))):
+    """ array version of 'makeTorus' (vert index of segment i, cross section vert j is i * M + j) """
+    u = np.arange(N) * (2 * math.pi / N)
+    v = np.arange(M) * (2 * math.pi / M)
+    # distance of each cross section vert from the torus axis
+    dist = R + r * np.cos(v)
+    verts = np.empty((N, M, 3), dtype=np.float64)
+    verts[..., 0] = np.outer(np.cos(u), dist)
+    verts[..., 1] = np.outer(np.sin(u), dist)
+    verts[..., 2] = r * np.sin(v)
+    verts += tuple(co)
+    idx = np.arange(N * M, dtype=np.int32).reshape(N, M)
+    nxt = np.roll(idx, -1, axis=0)
+    # quads (i, j), (i+1, j), (i+1, j+1), (i, j+1) face outward
+    faces = np.stack((idx, nxt, np.roll(nxt, -1, axis=1), np.roll(idx, -1, axis=1)), axis=2).reshape(-1, 4)
+    return MeshArrays(verts, *faceArrays((faces, False)))
+
+
+def arraysToMesh(arrays:MeshArrays, mesh:bpy.types.Mesh=None, name:str="generated_mesh"):
+    """ write mesh arrays to (new or empty) mesh datablock in bulk """
+    mesh = mesh or bpy.data.meshes.new(name)
+    mesh.vertices.add(len(arrays.verts))
+    mesh.vertices.foreach_set("co", arrays.verts.ravel())
+    if len(arrays.edges):
+        mesh.edges.add(len(arrays.edges))
+        mesh.edges.foreach_set("vertices", arrays.edges.ravel())
+    if len(arrays.face_sizes):
+        mesh.loops.add(len(arrays.loops))
+        mesh.loops.foreach_set("vertex_index", arrays.loops)
+        mesh.polygons.add(len(arrays.face_sizes))
+        mesh.polygons.foreach_set("loop_start", arrays.face_starts)
+        # face sizes follow from the loop starts in newer versions, where 'loop_total' is read-only
+        try:
+            mesh.polygons.foreach_set("loop_total", arrays.face_sizes)
+        except (AttributeError, TypeError):
+            pass
+        mesh.polygons.foreach_set("use_smooth", arrays.smooth)
+    mesh.update(calc_edges=len(arrays.face_sizes) > 0)
+    return mesh
+
+
+# arrays with more verts than this are appended to bmeshes through a scratch mesh datablock (bulk copy)
+BMESH_DIRECT_MAX_VERTS = 4096
+SCRATCH_MESH_NAME = "ds_scratch_mesh"
+
+
+def _getScratchMesh():
+    """ get empty mesh datablock reused for array to bmesh conversion (None where ID data can't be written) """
+    mesh = bpy.data.meshes.get(SCRATCH_MESH_NAME)
+    try:
+        if mesh is not None and hasattr(mesh, "clear_geometry"):
+            mesh.clear_geometry()
+        else:
+            # 2.80 and earlier can't clear mesh geometry
+            if mesh is not None:
+                bpy.data.meshes.remove(mesh)
+            mesh = bpy.data.meshes.new(SCRATCH_MESH_NAME)
+    except (AttributeError, RuntimeError):
+        return None
+    return mesh
+
+
+def _arraysToBMeshDirect(arrays:MeshArrays, bme:bmesh):
+    """ create bmesh elements of mesh arrays one by one, returns (new verts, new faces) """
+    verts = [bme.verts.new(co) for co in arrays.verts.tolist()]
+    for v1, v2 in arrays.edges.tolist():
+        bme.edges.new((verts[v1], verts[v2]))
+    loops = arrays.loops.tolist()
+    faces = []
+    for start, size, smooth in zip(arrays.face_starts.tolist(), arrays.face_sizes.tolist(), arrays.smooth.tolist()):
+        f = bme.faces.new([verts[i] for i in loops[start:start + size]])
+        f.smooth = smooth
+        faces.append(f)
+    return verts, faces
+
+
+def arraysToBMesh(arrays:MeshArrays, bme:bmesh=None):
+    """ append mesh arrays to bmesh, returns (bme, new verts, new faces) in array order """
+    bme = bme or bmesh.new()
+    mesh = _getScratchMesh() if len(arrays.verts) > BMESH_DIRECT_MAX_VERTS else None
+    if mesh is None:
+        verts, faces = _arraysToBMeshDirect(arrays, bme)
+        return bme, verts, faces
+    num_verts, num_faces = len(bme.verts), len(bme.faces)
+    arraysToMesh(arrays, mesh)
+    # from_mesh appends to existing bmesh data
+    bme.from_mesh(mesh)
+    # free the scratch geometry
+    _getScratchMesh()
+    bme.verts.ensure_lookup_table()
+    bme.faces.ensure_lookup_table()
+    return bme, bme.verts[num_verts:], bme.faces[num_faces:]
+
+
+# generated arrays are cached until their total size exceeds this many bytes
+PRIMITIVE_CACHE_BYTES = 64 * 1024 ** 2
+
+# (generator name, normalized params) -> frozen MeshArrays, least recently used first
+_primitive_cache = OrderedDict()
+# total 'nbytes' of the cached arrays
+_primitive_cache_bytes = 0
+# generator -> inspect.Signature (binding params to it normalizes positional/keyword calls)
+_generator_signatures = {}
+# (usage, generator name, normalized params) -> name of mesh datablock created from the cached arrays
+_primitive_meshes = {}
+
+
+def _normalizeParam(value):
+    """ make parameter hashable and insensitive to float noise (vectors become tuples, floats keep 9 significant digits) """
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float("%.9g" % value)
+    if isinstance(value, (Vector, list, tuple, np.ndarray)):
+        return tuple(_normalizeParam(v) for v in value)
+    return value
+
+
+def getPrimitiveKey(generator, *args, **kwargs):
+    """ get cache key of generator called with given params (defaults applied, so equivalent calls share a key) """
+    sig = _generator_signatures.get(generator)
+    if sig is None:
+        sig = _generator_signatures[generator] = inspect.signature(generator)
+    bound = sig.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return (generator.__name__, tuple(_normalizeParam(v) for v in bound.arguments.values()))
+
+
+def getCachedArrays(generator, *args, copy:bool=True, **kwargs):
+    """ get MeshArrays of generator (e.g. 'cylinderArrays') for params, reusing arrays generated before (read-only unless copied) """
+    global _primitive_cache_bytes
+    key = getPrimitiveKey(generator, *args, **kwargs)
+    arrays = _primitive_cache.get(key)
+    if arrays is None:
+        arrays = generator(*args, **kwargs).freeze()
+        _primitive_cache[key] = arrays
+        _primitive_cache_bytes += arrays.nbytes
+        _evictPrimitiveCache()
+    else:
+        _primitive_cache.move_to_end(key)
+    return arrays.copy() if copy else arrays
+
+
+def _evictPrimitiveCache():
+    """ drop least recently used arrays (and their unused meshes) until cache fits PRIMITIVE_CACHE_BYTES """
+    global _primitive_cache_bytes
+    while _primitive_cache and _primitive_cache_bytes > PRIMITIVE_CACHE_BYTES:
+        key, arrays = _primitive_cache.popitem(last=False)
+        _primitive_cache_bytes -= arrays.nbytes
+        for usage in ("shared", "template"):
+            mesh = _findPrimitiveMesh((usage,) + key)
+            _primitive_meshes.pop((usage,) + key, None)
+            if mesh is not None and mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+
+
+def _findPrimitiveMesh(mesh_key:tuple):
+    """ get mesh datablock created for key, None if it was removed or its name was taken by another mesh since """
+    mesh = bpy.data.meshes.get(_primitive_meshes.get(mesh_key, ""))
+    return mesh if mesh is not None and mesh.get("ds_primitive_key") == repr(mesh_key) else None
+
+
+def _getPrimitiveMesh(usage:str, generator, *args, **kwargs):
+    key = getPrimitiveKey(generator, *args, **kwargs)
+    mesh_key = (usage,) + key
+    mesh = _findPrimitiveMesh(mesh_key)
+    if mesh is not None:
+        # keep the arrays (and with them the mesh) from being evicted
+        if key in _primitive_cache:
+            _primitive_cache.move_to_end(key)
+        return mesh
+    name = generator.__name__[:-len("Arrays")]
+    mesh = arraysToMesh(getCachedArrays(generator, *args, copy=False, **kwargs), name=name if usage == "shared" else "ds_template_" + name)
+    mesh["ds_primitive_key"] = repr(mesh_key)
+    _primitive_meshes[mesh_key] = mesh.name
+    return mesh
+
+
+def getCachedMesh(generator, *args, **kwargs):
+    """ get mesh datablock of generator for params, shared by all callers (link it to objects instead of copying it) """
+    return _getPrimitiveMesh("shared", generator, *args, **kwargs)
+
+
+def makeCachedBMesh(generator, *args, bme:bmesh=None, **kwargs):
+    """ append primitive of generator for params to bmesh, returns (bme, new verts, new faces) in array order (large primitives are copied from a cached template mesh) """
+    arrays = getCachedArrays(generator, *args, copy=False, **kwargs)
+    # small primitives are quicker to build directly than through a mesh datablock per parameter set
+    if len(arrays.verts) <= BMESH_DIRECT_MAX_VERTS:
+        return arraysToBMesh(arrays, bme)
+    try:
+        # private template mesh (shared meshes may have been edited by their users)
+        mesh = _getPrimitiveMesh("template", generator, *args, **kwargs)
+    except (AttributeError, RuntimeError):
+        # ID data can't be written in this context
+        return arraysToBMesh(arrays, bme)
+    bme = bme or bmesh.new()
+    num_verts, num_faces = len(bme.verts), len(bme.faces)
+    # from_mesh appends to existing bmesh data
+    bme.from_mesh(mesh)
+    bme.verts.ensure_lookup_table()
+    bme.faces.ensure_lookup_table()
+    return bme, bme.verts[num_verts:], bme.faces[num_faces:]
+
+
+def clearPrimitiveCache():
+    """ drop all cached primitive arrays and unused meshes (shared meshes are left to their users) """
+    global _primitive_cache_bytes
+    for mesh_key in list(_primitive_meshes):
+        mesh = _findPrimitiveMesh(mesh_key)
+        if mesh is not None and mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+    _primitive_cache.clear()
+    _primitive_cache_bytes = 0
+    _primitive_meshes.clear()
+
+
 def makeSquare(coord1:Vector, coord2:Vector, face:bool=True, flipNormal:bool=False, bme:bmesh=None):
     """
     create a square with bmesh
@@ -85,32 +456,8 @@ def makeCube(coord1:Vector, coord2:Vector, sides:list=[False]*6, flipNormals:boo
     assert coord1.y < coord2.y
     assert coord1.z < coord2.z
 
-    # create new bmesh object
-    bme = bme or bmesh.new()
-
-    # create vertices
-    vList = [bme.verts.new((x, y, z)) for x in [coord1.x, coord2.x] for y in [coord1.y, coord2.y] for z in [coord1.z, coord2.z]]
-
-    # create faces
+    bme, vList, _ = makeCachedBMesh(cubeArrays, coord1, coord2, sides, flipNormals, bme=bme)
     v1, v2, v3, v4, v5, v6, v7, v8 = vList
-    newFaces = []
-    if sides[0]:
-        newFaces.append([v6, v8, v4, v2])
-    if sides[1]:
-        newFaces.append([v3, v7, v5, v1])
-    if sides[4]:
-        newFaces.append([v4, v8, v7, v3])
-    if sides[3]:
-        newFaces.append([v2, v4, v3, v1])
-    if sides[2]:
-        newFaces.append([v8, v6, v5, v7])
-    if sides[5]:
-        newFaces.append([v6, v2, v1, v5])
-
-    for f in newFaces:
-        if flipNormals:
-            f.reverse()
-        bme.faces.new(f)
 
     return [v1, v3, v7, v5, v2, v6, v8, v4]
 
@@ -128,20 +475,7 @@ def makeCircle(r:float, N:int, co:Vector=Vector((0,0,0)), face:bool=True, flipNo
         bme         -- bmesh object in which to create verts
 
     """
-    # initialize vars
-    bme = bme or bmesh.new()
-    verts = []
-
-    # create verts around circumference of circle
-    for i in range(N):
-        circ_val = ((2 * math.pi) / N) * i
-        x = r * math.cos(circ_val)
-        y = r * math.sin(circ_val)
-        coord = co + Vector((x, y, 0))
-        verts.append(bme.verts.new(coord))
-    # create face
-    if face:
-        bme.faces.new(verts if not flipNormals else verts[::-1])
+    bme, verts, _ = makeCachedBMesh(circleArrays, r, N, co, face, flipNormals, bme=bme)
 
     return verts
 
@@ -161,32 +495,8 @@ def makeCylinder(r:float, h:float, N:int, co:Vector=Vector((0,0,0)), botFace:boo
         bme         -- bmesh object in which to create verts
 
     """
-    # initialize vars
-    bme = bme or bmesh.new()
-    topVerts = []
-    botVerts = []
-    sideFaces = []
-
-    # create upper and lower circles
-    for i in range(N):
-        circ_val = ((2 * math.pi) / N) * i
-        x = r * math.cos(circ_val)
-        y = r * math.sin(circ_val)
-        z = h / 2
-        coordT = co + Vector((x, y, z))
-        coordB = co + Vector((x, y, -z))
-        topVerts.append(bme.verts.new(coordT))
-        botVerts.append(bme.verts.new(coordB))
-
-    # create faces on the sides
-    _, sideFaces = connectCircles(topVerts if flipNormals else botVerts, botVerts if flipNormals else topVerts, bme)
-    smoothBMFaces(sideFaces)
-
-    # create top and bottom faces
-    if topFace:
-        bme.faces.new(topVerts if not flipNormals else topVerts[::-1])
-    if botFace:
-        bme.faces.new(botVerts[::-1] if not flipNormals else botVerts)
+    bme, verts, _ = makeCachedBMesh(cylinderArrays, r, h, N, co, botFace, topFace, flipNormals, bme=bme)
+    topVerts, botVerts = verts[0::2], verts[1::2]
 
     # return bme & dictionary with lists of top and bottom vertices
     return bme, {"bottom":botVerts[::-1], "top":topVerts}
@@ -207,17 +517,9 @@ def makeTube(r:float, h:float, t:float, N:int, co:Vector=Vector((0,0,0)), topFac
         bme     -- bmesh object in which to create verts
 
     """
-    # create new bmesh object
-    if bme == None:
-        bme = bmesh.new()
-
-    # create upper and lower circles
-    bme, innerVerts = makeCylinder(r, h, N, co=co, botFace=False, topFace=False, flipNormals=True, bme=bme)
-    bme, outerVerts = makeCylinder(r + t, h, N, co=co, botFace=False, topFace=False, bme=bme)
-    if topFace:
-        connectCircles(outerVerts["top"], innerVerts["top"], bme)
-    if botFace:
-        connectCircles(outerVerts["bottom"], innerVerts["bottom"], bme)
+    bme, verts, _ = makeCachedBMesh(tubeArrays, r, h, t, N, co, topFace, botFace, bme=bme)
+    innerVerts = {"bottom":verts[1:2 * N:2][::-1], "top":verts[0:2 * N:2]}
+    outerVerts = {"bottom":verts[2 * N + 1::2][::-1], "top":verts[2 * N::2]}
     # return bmesh
     return bme, {"outer":outerVerts, "inner":innerVerts}
 
@@ -243,20 +545,7 @@ def makeTetra():
 # r = radius, N = numVerts
 def makeCone(r, N):
     # create new bmesh object
-    bme = bmesh.new()
-
-    # do modifications here
-    topV = bme.verts.new((0, 0, 1))
-    # create bottom circle
-    vertList = []
-    for i in range(N):
-        vertList.append(bme.verts.new((r * math.cos(((2 * math.pi) / N) * i), r * math.sin(((2 * math.pi) / N) * i), -1)))
-    bme.faces.new(vertList)
-
-    bme.faces.new((vertList[-1], vertList[0], topV))
-    for v in range(N-1):
-        bme.faces.new((vertList.pop(0), vertList[0], topV))
-
+    bme, _, _ = makeCachedBMesh(coneArrays, r, N)
 
     # return bmesh
     return bme
@@ -324,36 +613,7 @@ def makeDodec():
 # r = radius, V = numVerticalCircles, H = numHorizontalCircles
 def makeUVSphere(r, V, H):
     # create new bmesh object
-    bme = bmesh.new()
-    testBme = bmesh.new()
-
-    # create vertices
-    vertListV = []
-    vertListH = []
-    for i in range(int(V/4), int((3*V)/4)+1):
-        v = testBme.verts.new((r * math.cos(((2 * math.pi) / V) * i), 0, r * math.sin(((2 * math.pi) / V) * i)))
-        vertListV.append(v)
-        nextVertListH = []
-        if i != int(V/4) and i != int((3*V)/4):
-            for j in range(H):
-                # replace 'r' with x value of 'v'
-                nextVertListH.append(bme.verts.new((v.co.x * math.cos(((2 * math.pi) / H) * j), v.co.x * math.sin(((2 * math.pi) / H) * j), v.co.z)))
-            vertListH.append(nextVertListH)
-        elif i == int(V/4):
-            topV = bme.verts.new((v.co))
-        elif i == int((3*V)/4):
-            botV = bme.verts.new((v.co))
-
-    # create faces
-    for l in range(len(vertListH)-1):
-        for m in range(-1, len(vertListH[l])-1):
-            bme.faces.new((vertListH[l][m], vertListH[l+1][m], vertListH[l+1][m+1], vertListH[l][m+1]))
-
-    # create top and bottom faces
-    for n in range(-1,H-1):
-        bme.faces.new((vertListH[0][n], vertListH[0][n+1], topV))
-        bme.faces.new((vertListH[-1][n+1], vertListH[-1][n], botV))
-
+    bme, _, _ = makeCachedBMesh(uvSphereArrays, r, V, H)
 
     # return bmesh
     return bme
@@ -411,18 +671,20 @@ def makeTruncIco(layer):
     bpy.ops.object.editmode_toggle()
 
 
-def makeTorus():
-    # create new bmesh object
-    bme = bmesh.new()
-    testBme = bmesh.new()
-
-    # create reference circle
-    vertList = []
-    # for i in range(N):
-    #     vertList.append(testBme.verts.new((r * math.cos(((2 * math.pi) / N) * i), r * math.sin(((2 * math.pi) / N) * i), z)))
-
+def makeTorus(R:float, r:float, N:int, M:int, co:Vector=Vector((0,0,0)), bme:bmesh=None):
+    """
+    create a torus with bmesh
 
+    Keyword Arguments:
+        R   -- major radius (torus center to tube center)
+        r   -- minor radius (tube radius)
+        N   -- number of segments around the torus center
+        M   -- number of verts per tube cross section
+        co  -- coordinate of torus center
+        bme -- bmesh object in which to create verts
 
+    """
+    bme, _, _ = makeCachedBMesh(torusArrays, R, r, N, M, co, bme=bme)
 
     # return bmesh
     return bme
@@ -433,6 +695,128 @@ def tupleAdd(p1, p2):
     return tuple(x+y for x,y in zip(p1, p2))
 
 
+def getLatticeRes(vertDist:Vector, scale:Vector, offset:Vector=Vector((0, 0, 0))):
+    """ get (nx, ny, nz) resolution and snapped offset of lattice surrounding object of size 'scale' """
+    # shift offset to ensure lattice surrounds object
+    offset = offset - vec_remainder(offset, vertDist)
+    # calculate res of lattice
+    res = (round(scale.x / vertDist.x),
+           round(scale.y / vertDist.y),
+           round(scale.z / vertDist.z))
+    return tuple(int(n) for n in res), offset
+
+
+def _latticeAxes(res:tuple, vertDist:Vector, offset:Vector):
+    """ coordinates of lattice indices on each axis: (i - res / 2) * vertDist + offset """
+    return [(np.arange(n) - n / 2) * d + o for n, d, o in zip(res, vertDist, offset)]
+
+
+def latticeArrays(vertDist:Vector, scale:Vector, offset:Vector=Vector((0, 0, 0))):
+    """ array version of 'makeLattice' (vert index of lattice coordinate x, y, z is (x * ny + y) * nz + z) """
+    res, offset = getLatticeRes(vertDist, scale, offset)
+    nx, ny, nz = res
+    gx, gy, gz = np.meshgrid(*_latticeAxes(res, vertDist, offset), indexing="ij", sparse=True)
+    verts = np.empty((nx, ny, nz, 3), dtype=np.float32)
+    verts[..., 0], verts[..., 1], verts[..., 2] = gx, gy, gz
+    # connect each vert to its predecessor along x, y and z
+    idx = np.arange(nx * ny * nz, dtype=np.int32).reshape(nx, ny, nz)
+    edges = np.concatenate((
+        np.stack((idx[1:], idx[:-1]), axis=-1).reshape(-1, 2),
+        np.stack((idx[:, 1:], idx[:, :-1]), axis=-1).reshape(-1, 2),
+        np.stack((idx[:, :, 1:], idx[:, :, :-1]), axis=-1).reshape(-1, 2),
+    ))
+    return MeshArrays(verts, edges=edges)
+
+
+# estimated peak bytes per lattice vert while a slab is generated and written (coords, indices, edges and temporaries)
+LATTICE_BYTES_PER_VERT = 128
+LATTICE_MEMORY_BUDGET = 256 * 1024 ** 2
+
+
+def getLatticeSlabSize(res:tuple, memory_budget:int=LATTICE_MEMORY_BUDGET):
+    """ get number of z layers per slab so that generating a slab stays within 'memory_budget' bytes (at least one layer) """
+    nx, ny, nz = res
+    layer_bytes = max(nx * ny, 1) * LATTICE_BYTES_PER_VERT
+    return int(min(max(memory_budget // layer_bytes, 1), max(nz, 1)))
+
+
+def iterLatticeSlabs(vertDist:Vector, scale:Vector, offset:Vector=Vector((0, 0, 0)), memory_budget:int=LATTICE_MEMORY_BUDGET, verts:bool=True, edges:bool=True):
+    """
+    generate lattice in z slabs, yields (z range, MeshArrays) per slab
+
+    verts are ordered by layer (index of lattice coordinate x, y, z is (z * nx + x) * ny + y) and
+    edge indices are global, so edges of a slab connect its first layer to the last layer of the previous slab
+    """
+    res, offset = getLatticeRes(vertDist, scale, offset)
+    nx, ny, nz = res
+    ax_x, ax_y, ax_z = _latticeAxes(res, vertDist, offset)
+    layer = nx * ny
+    step = getLatticeSlabSize(res, memory_budget)
+    for z0 in range(0, nz, step):
+        z1 = min(z0 + step, nz)
+        slab_verts = np.empty((0, 3), dtype=np.float32)
+        if verts:
+            slab_verts = np.empty((z1 - z0, nx, ny, 3), dtype=np.float32)
+            slab_verts[..., 0] = ax_x[None, :, None]
+            slab_verts[..., 1] = ax_y[None, None, :]
+            slab_verts[..., 2] = ax_z[z0:z1, None, None]
+        slab_edges = None
+        if edges:
+            # include previous layer to connect the slab to the verts already emitted
+            zs = max(z0 - 1, 0)
+            idx = np.arange(zs * layer, z1 * layer, dtype=np.int32).reshape(z1 - zs, nx, ny)
+            cur = idx[z0 - zs:]
+            slab_edges = np.concatenate((
+                np.stack((cur[:, 1:], cur[:, :-1]), axis=-1).reshape(-1, 2),
+                np.stack((cur[:, :, 1:], cur[:, :, :-1]), axis=-1).reshape(-1, 2),
+                np.stack((idx[1:], idx[:-1]), axis=-1).reshape(-1, 2),
+            ))
+        yield (z0, z1), MeshArrays(slab_verts, edges=slab_edges)
+
+
+def getLatticeCounts(res:tuple):
+    """ get (number of verts, number of edges) of lattice with resolution 'res' """
+    nx, ny, nz = res
+    return nx * ny * nz, (nx - 1) * ny * nz + nx * (ny - 1) * nz + nx * ny * (nz - 1)
+
+
+def _writeRows(f, fmt:str, rows:np.ndarray, chunk:int=65536):
+    """ write rows of array as text lines formatted with 'fmt', a bounded number of rows at a time """
+    for i in range(0, len(rows), chunk):
+        block = rows[i:i + chunk]
+        f.write((fmt * len(block)) % tuple(block.ravel().tolist()))
+
+
+def writeLattice(filepath:str, vertDist:Vector, scale:Vector, offset:Vector=Vector((0, 0, 0)), memory_budget:int=LATTICE_MEMORY_BUDGET):
+    """ write lattice verts and edges to PLY (binary) or OBJ file slab by slab, without holding the full lattice in memory """
+    ext = os.path.splitext(filepath)[1].lower()
+    res, _ = getLatticeRes(vertDist, scale, offset)
+    if ext == ".ply":
+        num_verts, num_edges = getLatticeCounts(res)
+        with open(filepath, "wb") as f:
+            f.write(("ply\n"
+                     "format binary_little_endian 1.0\n"
+                     "element vertex %(num_verts)d\n"
+                     "property float x\nproperty float y\nproperty float z\n"
+                     "element edge %(num_edges)d\n"
+                     "property int vertex1\nproperty int vertex2\n"
+                     "end_header\n" % {"num_verts":num_verts, "num_edges":num_edges}).encode("ascii"))
+            # PLY stores all verts before the edges, so each is streamed in its own pass
+            for _, slab in iterLatticeSlabs(vertDist, scale, offset, memory_budget, edges=False):
+                f.write(slab.verts.astype("<f4").tobytes())
+            for _, slab in iterLatticeSlabs(vertDist, scale, offset, memory_budget, verts=False):
+                f.write(slab.edges.astype("<i4").tobytes())
+    elif ext == ".obj":
+        with open(filepath, "w") as f:
+            for _, slab in iterLatticeSlabs(vertDist, scale, offset, memory_budget):
+                _writeRows(f, "v %.6f %.6f %.6f\n", slab.verts)
+                # OBJ indices start at 1
+                _writeRows(f, "l %d %d\n", slab.edges + 1)
+    else:
+        raise ValueError("Unsupported lattice file format '%(ext)s' (expected '.ply' or '.obj')" % locals())
+    return res
+
+
 def makeLattice(vertDist:Vector, scale:Vector, offset:Vector=Vector((0, 0, 0))):
     """ return lattice coordinate matrix surrounding object of size 'scale'
 
@@ -442,31 +826,28 @@ def makeLattice(vertDist:Vector, scale:Vector, offset:Vector=Vector((0, 0, 0))):
     offset    -- offset lattice center from origin
 
     """
-
-    # shift offset to ensure lattice surrounds object
-    offset = offset - vec_remainder(offset, vertDist)
-    # calculate res of lattice
-    res = Vector((round(scale.x / vertDist.x),
-                  round(scale.y / vertDist.y),
-                  round(scale.z / vertDist.z)))
-    # populate coord matrix
-    nx, ny, nz = int(res.x), int(res.y), int(res.z)
-    create_coord = lambda v: vec_mult(v - res / 2, vertDist) + offset
-    coordMatrix = [[[create_coord(Vector((x, y, z))) for z in range(nz)] for y in range(ny)] for x in range(nx)]
-
     # create bmesh
-    bme = bmesh.new()
-    vertMatrix = np.zeros((len(coordMatrix), len(coordMatrix[0]), len(coordMatrix[0][0]))).tolist()
-    # add vertex for each coordinate
-    for x in range(len(coordMatrix)):
-        for y in range(len(coordMatrix[0])):
-            for z in range(len(coordMatrix[0][0])):
-                vertMatrix[x][y][z] = bme.verts.new(coordMatrix[x][y][z])
-                # create new edges from vert
-                if x != 0: bme.edges.new((vertMatrix[x][y][z], vertMatrix[x-1][y][z]))
-                if y != 0: bme.edges.new((vertMatrix[x][y][z], vertMatrix[x][y-1][z]))
-                if z != 0: bme.edges.new((vertMatrix[x][y][z], vertMatrix[x][y][z-1]))
+    bme, _, _ = arraysToBMesh(latticeArrays(vertDist, scale, offset))
     # draw bmesh verts in 3D space
     # drawBMesh(bme)
 
     return bme
+
+
+def makeLatticeSlabs(vertDist:Vector, scale:Vector, offset:Vector=Vector((0, 0, 0)), memory_budget:int=LATTICE_MEMORY_BUDGET, bme:bmesh=None):
+    """
+    same lattice as 'makeLattice', generated in z slabs using at most 'memory_budget' bytes besides the bmesh
+
+    NOTE: verts are ordered by layer (see 'iterLatticeSlabs'), not in the (x, y, z) order of 'makeLattice'
+    """
+    bme = bme or bmesh.new()
+    for _, slab in iterLatticeSlabs(vertDist, scale, offset, memory_budget):
+        first = len(bme.verts)
+        # edges to the previous slab refer to verts outside the slab mesh, add those directly
+        seam = slab.edges.min(axis=1) < first if len(slab.edges) else np.zeros(0, dtype=bool)
+        slab.edges, seam_edges = slab.edges[~seam] - first, slab.edges[seam]
+        arraysToBMesh(slab, bme)
+        bme.verts.ensure_lookup_table()
+        for v1, v2 in seam_edges.tolist():
+            bme.edges.new((bme.verts[v1], bme.verts[v2]))
+    return bme
@@ -0,0 +1,76 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# System imports
+# NONE!
+
+# Blender imports
+import bpy
+
+# Addon imports
+from .common import *
+from .hdri import *
+
+
+def _override(saved:list, owner, attr:str, value):
+    """ set attribute and remember its original value (unless it already has the value) """
+    if owner is None or value is None or not hasattr(owner, attr):
+        return
+    cur = getattr(owner, attr)
+    if cur == value:
+        return
+    saved.append((owner, attr, cur, value))
+    setattr(owner, attr, value)
+
+
+def applyNavigationQuality(scn, samples:int=4):
+    """ lower viewport quality for interactive navigation, returns settings to pass to 'restoreNavigationQuality' """
+    saved = []
+    # CYCLES
+    cycles = getattr(scn, "cycles", None)
+    if cycles is not None:
+        _override(saved, cycles, "preview_samples", min(cycles.preview_samples, samples) if cycles.preview_samples else samples)
+        # 2.90+ (earlier versions have no viewport denoising toggle)
+        _override(saved, cycles, "use_preview_denoising", True)
+    # EEVEE
+    eevee = getattr(scn, "eevee", None)
+    if eevee is not None:
+        _override(saved, eevee, "taa_samples", min(eevee.taa_samples, samples) if eevee.taa_samples else samples)
+    # world texture
+    envTexNode = getEnvTexNode(scn)
+    if envTexNode is not None:
+        # a queued full resolution map must not replace the preview map until navigation ends
+        pending = suspendPendingHDRI(scn)
+        if pending is not None:
+            saved.append((scn, None, pending, None))
+        # never generate missing levels here (the closest available map is used instead)
+        _override(saved, envTexNode, "image", openHDRI(HDRI_PREVIEW_RESOLUTION, scn.ds_hdri_filter, build=False))
+    return saved
+
+
+def restoreNavigationQuality(saved:list):
+    """ restore settings changed by 'applyNavigationQuality' (in reverse order), except those changed again since """
+    for owner, attr, value, applied in reversed(saved):
+        try:
+            if attr is None:
+                resumePendingHDRI(owner, value)
+            elif getattr(owner, attr) == applied:
+                setattr(owner, attr, value)
+        except ReferenceError:
+            # owner was removed while navigating
+            pass
+    saved.clear()
@@ -0,0 +1,151 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# System imports
+import os
+import json
+from math import radians
+try:
+    import tomllib as toml_parser
+except ImportError:
+    try:
+        import toml as toml_parser
+    except ImportError:
+        toml_parser = None
+
+# Blender imports
+import bpy
+
+# Addon imports
+from .common import *
+from .hdri import HDRI_RESOLUTIONS
+from .rig import CAMERA_SPEC
+
+
+PRESET_EXTENSIONS = (".json", ".toml") if toml_parser else (".json",)
+DEFAULT_RIG_PRESET = "studio_default"
+
+# (path, size, mtime) -> content hash of preset file
+_preset_hashes = {}
+# content hash -> compiled build plan
+_compiled_presets = {}
+# enum items must stay referenced while Blender uses them
+_preset_items = []
+
+
+def getPresetsDirectory():
+    """ get directory containing rig presets """
+    return os.path.join(get_addon_directory(), "presets")
+
+
+def getRigPresetItems(self, context):
+    """ enum items callback listing rig presets """
+    presets_dir = getPresetsDirectory()
+    filenames = sorted(f for f in os.listdir(presets_dir) if f.endswith(PRESET_EXTENSIONS)) if os.path.isdir(presets_dir) else []
+    # the first item is the property's default, keep the white studio rig there
+    filenames.sort(key=lambda f: os.path.splitext(f)[0] != DEFAULT_RIG_PRESET)
+    _preset_items[:] = [(f, os.path.splitext(f)[0].replace("_", " ").title(), "Rig preset '%(f)s'" % locals()) for f in filenames]
+    return _preset_items
+
+
+def _getValue(data:dict, key:str, default=None, where:str=""):
+    if key not in data:
+        if default is None:
+            raise ValueError("%(where)s: missing '%(key)s'" % locals())
+        return default
+    return data[key]
+
+
+def _getNumber(data:dict, key:str, default=None, where:str=""):
+    value = _getValue(data, key, default, where)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("%(where)s: '%(key)s' must be a number" % locals())
+    return float(value)
+
+
+def _getVector(data:dict, key:str, length:int, default=None, where:str=""):
+    value = _getValue(data, key, default, where)
+    if not isinstance(value, (list, tuple)) or len(value) != length or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value):
+        raise ValueError("%(where)s: '%(key)s' must be a list of %(length)d numbers" % locals())
+    return tuple(float(v) for v in value)
+
+
+def compileRigPreset(data:dict, name:str="preset"):
+    """ validate rig preset and flatten it into a build plan of light/camera specs (rotations in degrees) """
+    if not isinstance(data, dict):
+        raise ValueError("%(name)s: preset must be a table" % locals())
+    lights = _getValue(data, "lights", where=name)
+    if not isinstance(lights, list):
+        raise ValueError("%(name)s: 'lights' must be a list" % locals())
+    light_specs = []
+    for i, light in enumerate(lights):
+        where = "%(name)s: lights[%(i)d]" % locals()
+        if not isinstance(light, dict):
+            raise ValueError("%(where)s: light must be a table" % locals())
+        # alpha may be omitted from light colors
+        color = _getValue(light, "color", (1, 1, 1, 1), where)
+        if isinstance(color, (list, tuple)) and len(color) == 3:
+            color = tuple(color) + (1,)
+        light_specs.append({
+            "name": "Default_Scene_emitter_%d" % (i + 1),
+            "color": _getVector({"color":color}, "color", 4, where=where),
+            "energy": _getNumber(light, "energy", where=where),
+            "size": _getNumber(light, "size", 0.1, where),
+            "location": _getVector(light, "location", 3, where=where),
+            "rotation": tuple(radians(a) for a in _getVector(light, "rotation", 3, (0, 0, 0), where)),
+            "scale": _getVector(light, "scale", 3, (1, 1, 1), where),
+        })
+    camera = data.get("camera", {})
+    where = "%(name)s: camera" % locals()
+    camera_spec = dict(CAMERA_SPEC)
+    camera_spec["location"] = _getVector(camera, "location", 3, CAMERA_SPEC["location"], where)
+    if "rotation" in camera:
+        camera_spec["rotation"] = tuple(radians(a) for a in _getVector(camera, "rotation", 3, where=where))
+    world = data.get("world", {})
+    where = "%(name)s: world" % locals()
+    hdri_resolution = world.get("hdri_resolution")
+    if hdri_resolution is not None and hdri_resolution not in ("AUTO",) + HDRI_RESOLUTIONS:
+        raise ValueError("%(where)s: unknown 'hdri_resolution' '%(hdri_resolution)s'" % locals())
+    return {
+        "name": str(data.get("name", name)),
+        "lights": tuple(light_specs),
+        "camera": camera_spec,
+        "world_strength": _getNumber(world, "strength", 0.9, where),
+        "hdri_resolution": hdri_resolution,
+    }
+
+
+def getRigPreset(filename:str):
+    """ get compiled build plan for preset file (parsed and validated once per file content) """
+    path = os.path.join(getPresetsDirectory(), filename)
+    st = os.stat(path)
+    file_key = (path, st.st_size, st.st_mtime_ns)
+    digest = _preset_hashes.get(file_key)
+    if digest is None or digest not in _compiled_presets:
+        with open(path, "rb") as f:
+            content = f.read()
+        digest = hash_str(content.decode("utf-8"))
+        _preset_hashes[file_key] = digest
+        if digest not in _compiled_presets:
+            if path.endswith(".toml"):
+                if toml_parser is None:
+                    raise ValueError("%(filename)s: TOML presets need Python 3.11+ or the 'toml' module" % locals())
+                data = toml_parser.loads(content.decode("utf-8"))
+            else:
+                data = json.loads(content.decode("utf-8"))
+            _compiled_presets[digest] = compileRigPreset(data, filename)
+    return _compiled_presets[digest]
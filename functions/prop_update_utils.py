@@ -23,11 +23,13 @@ import bpy
 
 # Addon imports
 from .common import *
+from .hdri import *
+from .rig_registry import *
 
 
 def updateScale(self, context):
     scn = context.scene
-    parent = bpy.data.objects.get('Default_Scene_parent_1')
+    parent = getRigObject(PARENT_ROLES[0], scn)
     if parent:
         parent.scale = (scn.ds_scale, scn.ds_scale, scn.ds_scale)
 
@@ -35,28 +37,35 @@ def updateScale(self, context):
 def updateCamera(self, context):
     scn = context.scene
     if scn.ds_include_camera:
-        enableDefaultCamera()
+        enableDefaultCamera(scn)
     else:
-        cam_ob = bpy.data.objects.get("Default_Scene_camera_object")
+        cam_ob = getRigObject(CAMERA_ROLE, scn)
         if cam_ob is not None: unlink_object(cam_ob)
 
 
-def loadHDRI(self, context):
-    # get environment texture node
-    scn = context.scene
-    nt = scn.world.node_tree
-    envTexNode = nt.nodes.get("Default World Texture")
-    if envTexNode is None:
+# True while a rig preset assigns the HDRI resolution (not a choice of the user)
+_applying_preset_resolution = False
+
+
+def setPresetHDRIResolution(scn, res:str):
+    """ set HDRI resolution of rig preset unless the user picked one for the scene """
+    global _applying_preset_resolution
+    if scn.ds_hdri_resolution_user_set or scn.hdri_resolution == res:
         return
+    _applying_preset_resolution = True
+    try:
+        scn.hdri_resolution = res
+    finally:
+        _applying_preset_resolution = False
+
 
-    # open image
-    # addonPath = os.path.join(get_addon_directory(), "textures")
-    # bpy.ops.image.open(filepath="//textures/studio_small_01_4k.hdr", directory=addonPath, files=[{"name":"studio_small_01_4k.hdr"}], show_multiview=False)
-    # envTexNode.image = bpy.data.images["studio_small_01_4k.hdr"]
-    name = "studio_small_01_{res}.hdr".format(res=scn.hdri_resolution)
-    im_path = os.path.join(get_addon_directory(), "textures", name)
-    im = bpy.data.images.get(name)
-    if im is None:
-        bpy.ops.image.open(filepath=im_path)
-        im = bpy.data.images[name]
-    envTexNode.image = im
+def updateHDRIResolution(self, context):
+    if not _applying_preset_resolution:
+        self.ds_hdri_resolution_user_set = True
+    loadHDRI(self, context)
+
+
+def loadHDRI(self, context):
+    scn = context.scene
+    budget = scn.ds_hdri_memory_budget * 1024 ** 2
+    setHDRI(scn, resolveHDRIResolution(scn), progressive=scn.ds_progressive_hdri, method=scn.ds_hdri_filter, budget=budget)
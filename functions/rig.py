@@ -0,0 +1,213 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# System imports
+from math import radians
+
+# Blender imports
+import bpy
+from mathutils import Vector
+from bpy.types import Object
+
+# Addon imports
+from .common import *
+from .hdri import detachHDRIs, getImageMemory
+from .rig_registry import *
+
+
+# emit1_color = (0.576, 0.824, 0.953, 1)
+# emit2_color = (0.529, 0.733, 0.922, 1)
+# emit3_color = (1, 1, 0.95, 1)
+LIGHT_SPECS = (
+    {"name":"Default_Scene_emitter_1", "color":(1, 1, 1, 1), "energy":1, "size":0.1,
+     "location":(2.5, 0, 1.2), "rotation":(radians(70), radians(-12), radians(90)), "scale":(30, 25, 30)},
+    {"name":"Default_Scene_emitter_2", "color":(1, 1, 1, 1), "energy":1, "size":0.1,
+     "location":(-1.8, -0.8, 0.6), "rotation":(radians(90), radians(-3), radians(-70)), "scale":(25, 20, 30)},
+    {"name":"Default_Scene_emitter_3", "color":(1, 1, 1, 1), "energy":1, "size":0.1,
+     "location":(0.25, 0.53, 1.75), "rotation":(radians(-4), radians(4), radians(35)), "scale":(30, 10, 20)},
+)
+CAMERA_SPEC = {"name":"Default_Scene_camera_object", "data_name":"Default_Scene_camera",
+               "location":(1.2, -4, 1.4), "rotation":(1.2708, 0, 0.3)}
+PARENT_NAMES = ("Default_Scene_parent_1", "Default_Scene_parent_2")
+
+
+def setIfChanged(owner, attr:str, value, tol:float=1e-6):
+    """ set attribute only if it differs from value (avoids needless depsgraph updates), returns True if set """
+    cur = getattr(owner, attr)
+    if isinstance(value, (tuple, list, Vector)):
+        changed = len(cur) != len(value) or any(abs(a - b) > tol for a, b in zip(cur, value))
+    elif isinstance(value, float) or (isinstance(value, int) and not isinstance(value, bool)):
+        changed = abs(cur - value) > tol
+    else:
+        changed = cur != value
+    if changed:
+        setattr(owner, attr, value)
+    return changed
+
+
+def ensureLink(nt, from_socket, to_socket):
+    """ link sockets in node tree unless they are already linked """
+    for link in to_socket.links:
+        if link.from_socket == from_socket:
+            return link
+    return nt.links.new(from_socket, to_socket)
+
+
+def ensureObject(name:str, new_data=None, obj_type:str="EMPTY", role:str=None, scn=None):
+    """ get rig member with role and type, or create one named 'name' ('new_data' creates its data) """
+    ob = getRigObject(role, scn) if role else None
+    if ob is None:
+        # adopt untagged objects of rigs created before the registry existed
+        ob = bpy.data.objects.get(name)
+        if ob is not None and RIG_ROLE_PROP in ob:
+            ob = None
+    if ob is not None and (ob.type != obj_type or ob.library is not None):
+        if role: unregisterRigObject(ob)
+        ob = None
+    if ob is None:
+        ob = bpy.data.objects.new(name, new_data() if new_data else None)
+    return registerRigObject(ob, role, scn) if role else ob
+
+
+def getRigLights(scn=None):
+    """ get light objects of default scene rig """
+    members = getRigMembers(scn)
+    lights = []
+    while True:
+        light_ob = members.get(getLightRole(len(lights)))
+        if light_ob is None:
+            return lights
+        lights.append(light_ob)
+
+
+def getRigObjects(scn=None):
+    """ get all objects of default scene rig """
+    # linked rig members belong to the library
+    return [obj for obj in getRigMembers(scn).values() if obj.library is None]
+
+
+def getEmissionNode(light):
+    """ get emission node of light (creates cycles light node tree if necessary) """
+    if not light.use_nodes:
+        light.use_nodes = True
+    nt = light.node_tree
+    emit = nt.nodes.get("Emission")
+    if emit is None:
+        emit = nt.nodes.new("ShaderNodeEmission")
+        out = nt.nodes.get("Light Output") or nt.nodes.new("ShaderNodeOutputLight")
+        nt.links.new(emit.outputs[0], out.inputs[0])
+    return emit
+
+
+def setLightValues(light_ob:Object, spec:dict):
+    """ write light spec to light object and its data (only values that differ are set) """
+    light = light_ob.data
+    setIfChanged(light, "type", "AREA")
+    if b280(): setIfChanged(light, "size", spec["size"])
+    # CYCLES
+    emit = getEmissionNode(light)
+    setIfChanged(emit.inputs[0], "default_value", spec["color"])
+    setIfChanged(emit.inputs[1], "default_value", spec["energy"] * 100)
+    # EEVEE
+    setIfChanged(light, "color", spec["color"][:3])
+    setIfChanged(light, "energy", spec["energy"])
+    # transform
+    setIfChanged(light_ob, "location", spec["location"])
+    setIfChanged(light_ob, "rotation_euler", spec["rotation"])
+    setIfChanged(light_ob, "scale", spec["scale"])
+
+
+def createLightRig(parent:Object=None, scn=None, specs:iter=LIGHT_SPECS):
+    """ create area lights of default scene rig with the data API (no operators, undo pushes or context) """
+    scn = scn or bpy.context.scene
+    lights = []
+    for i, spec in enumerate(specs):
+        light = bpy_lights().new(spec["name"], type="AREA")
+        light_ob = bpy.data.objects.new(spec["name"], light)
+        setLightValues(light_ob, spec)
+        light_ob.parent = parent
+        registerRigObject(light_ob, getLightRole(i), scn)
+        linkRigObject(light_ob, scn)
+        lights.append(light_ob)
+    return lights
+
+
+def reconcileLightRig(parent:Object=None, scn=None, specs:iter=LIGHT_SPECS):
+    """ update existing rig lights to match specs (missing lights are created) """
+    scn = scn or bpy.context.scene
+    lights = []
+    for i, spec in enumerate(specs):
+        light_ob = ensureObject(spec["name"], lambda: bpy_lights().new(spec["name"], type="AREA"), "LIGHT" if b280() else "LAMP", getLightRole(i), scn)
+        setLightValues(light_ob, spec)
+        setIfChanged(light_ob, "parent", parent)
+        if scn not in light_ob.users_scene:
+            linkRigObject(light_ob, scn)
+        lights.append(light_ob)
+    # remove lights left over from a preset with more lights
+    extra = getRigLights(scn)[len(lights):]
+    for light_ob in extra:
+        unregisterRigObject(light_ob)
+    delete(extra)
+    return lights
+
+
+def reconcileParents(scn=None):
+    """ get (or create) rig parent empties and update their values """
+    scn = scn or bpy.context.scene
+    parent1 = ensureObject(PARENT_NAMES[0], role=PARENT_ROLES[0], scn=scn)
+    setIfChanged(parent1, "scale", (scn.ds_scale, scn.ds_scale, scn.ds_scale))
+    parent2 = ensureObject(PARENT_NAMES[1], role=PARENT_ROLES[1], scn=scn)
+    setIfChanged(parent2, "parent", parent1)
+    return parent1, parent2
+
+
+def reconcileCamera(parent:Object=None, include:bool=True, scn=None, spec:dict=CAMERA_SPEC):
+    """ get (or create) rig camera (only a new camera gets the default placement, existing ones keep the user's) """
+    scn = scn or bpy.context.scene
+    last_cam_ob = getRigObject(CAMERA_ROLE, scn) or bpy.data.objects.get(spec["name"])
+    cam_ob = ensureObject(spec["name"], lambda: bpy.data.cameras.new(spec["data_name"]), "CAMERA", CAMERA_ROLE, scn)
+    setIfChanged(cam_ob, "parent", parent)
+    if cam_ob != last_cam_ob:
+        cam_ob.location = spec["location"]
+        cam_ob.rotation_euler = spec["rotation"]
+    if include:
+        if scn not in cam_ob.users_scene:
+            linkRigObject(cam_ob, scn)
+        select(cam_ob, active=True)
+        if scn.camera != cam_ob:
+            scn.camera = cam_ob
+    return cam_ob
+
+
+def removeRig(scn=None, remove_data:bool=True):
+    """ delete scene's rig with its collection and (optionally) the camera/light data and HDRI images it owns, returns (number of datablocks, pixel bytes) freed """
+    scn = scn or bpy.context.scene
+    objs = getRigObjects(scn)
+    ids = set(objs)
+    coll = getRigCollection(scn)
+    if coll is not None and ids.issuperset(coll.objects):
+        ids.add(coll)
+    ims = []
+    if remove_data:
+        # data shared with objects outside the rig (or kept with a fake user) stays
+        ids.update(ob.data for ob in objs if ob.data is not None and ob.data.users == 1 and ob.data.library is None)
+        ims = detachHDRIs(scn)
+        ids.update(ims)
+    freed = sum(getImageMemory(im) for im in ims)
+    batch_remove(ids)
+    invalidateRigRegistry()
+    return len(ids), freed
@@ -0,0 +1,136 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# System imports
+import os
+
+# Blender imports
+import bpy
+
+# Addon imports
+from .common import *
+from .rig import *
+from .rig_registry import _isValid
+
+
+RIG_LIBRARY_NAME = "default_scene_rig.blend"
+RIG_COLLECTION_NAME = "Default_Scene_rig"
+RIG_WORLD_NAME = "Default_Scene_world"
+
+# library path -> {"collection":..., "world":...} linked this session
+_linked_rig_libraries = {}
+
+
+def getRigLibraryPath():
+    """ get path of bundled rig library .blend """
+    return os.path.join(get_addon_directory(), "libraries", RIG_LIBRARY_NAME)
+
+
+def _findLinkedRig(path:str):
+    """ find rig collection and world linked from library already in memory """
+    cached = _linked_rig_libraries.get(path)
+    if cached is not None and all(_isValid(id_data) for id_data in cached.values()):
+        return cached
+    found = {}
+    for key, data_coll, name in (("collection", bpy_collections(), RIG_COLLECTION_NAME), ("world", bpy.data.worlds, RIG_WORLD_NAME)):
+        for id_data in data_coll:
+            lib = id_data.library
+            # linked datablocks keep their name
+            if id_data.name == name and lib is not None and os.path.normpath(bpy.path.abspath(lib.filepath)) == path:
+                found[key] = id_data
+    if len(found) != 2:
+        return None
+    _linked_rig_libraries[path] = found
+    return found
+
+
+def loadRigLibrary(link:bool=False, path:str=None):
+    """ link rig collection and world from library .blend (reusing linked datablocks), or append new copies of them """
+    path = os.path.normpath(path or getRigLibraryPath())
+    if link:
+        linked = _findLinkedRig(path)
+        if linked is not None:
+            return linked
+    if not os.path.exists(path):
+        raise OSError("Rig library not found: '%(path)s'" % locals())
+    with bpy.data.libraries.load(path, link=link) as (data_from, data_to):
+        if RIG_COLLECTION_NAME not in data_from.collections or RIG_WORLD_NAME not in data_from.worlds:
+            raise ValueError("Rig library '%s' must contain collection '%s' and world '%s'" % (path, RIG_COLLECTION_NAME, RIG_WORLD_NAME))
+        data_to.collections = [RIG_COLLECTION_NAME]
+        data_to.worlds = [RIG_WORLD_NAME]
+    loaded = {"collection":data_to.collections[0], "world":data_to.worlds[0]}
+    if link:
+        _linked_rig_libraries[path] = loaded
+    return loaded
+
+
+def appendRig(parent1:Object, scn=None, path:str=None):
+    """ append rig lights and world from library as local, editable copies (each call appends new ones) """
+    scn = scn or bpy.context.scene
+    loaded = loadRigLibrary(link=False, path=path)
+    for ob in loaded["collection"].objects:
+        # members keep their role but join this scene's rig
+        role = ob.get(RIG_ROLE_PROP)
+        if role is not None:
+            registerRigObject(ob, role, scn)
+        if scn not in ob.users_scene:
+            linkRigObject(ob, scn)
+    # the objects now live in this scene's rig collection
+    bpy_collections().remove(loaded["collection"])
+    _, parent2 = reconcileParents(scn)
+    setIfChanged(parent2, "parent", parent1)
+    if scn.world != loaded["world"]:
+        scn.world = loaded["world"]
+    return parent2, getRigLights(scn)
+
+
+def linkRig(parent1:Object, scn=None, path:str=None):
+    """ instance linked rig collection from 'parent1' and use linked world (datablocks are shared, not copied) """
+    scn = scn or bpy.context.scene
+    loaded = loadRigLibrary(link=True, path=path)
+    setIfChanged(parent1, "instance_type", "COLLECTION")
+    setIfChanged(parent1, "instance_collection", loaded["collection"])
+    if scn not in parent1.users_scene:
+        link_object(parent1, scn)
+    if scn.world != loaded["world"]:
+        scn.world = loaded["world"]
+    return parent1
+
+
+def writeRigLibrary(scn=None, path:str=None):
+    """ write lights and world of the current rig to library .blend """
+    scn = scn or bpy.context.scene
+    path = path or getRigLibraryPath()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    parent2 = getRigObject(PARENT_ROLES[1], scn)
+    if parent2 is None or scn.world is None:
+        raise ValueError("Set up the default scene before writing the rig library")
+    coll = bpy_collections().new(RIG_COLLECTION_NAME)
+    world = scn.world.copy()
+    world.name = RIG_WORLD_NAME
+    last_parent = parent2.parent
+    try:
+        for ob in [parent2] + getRigLights(scn):
+            coll.objects.link(ob)
+        # the library rig is placed by its instance/parent in the target file
+        parent2.parent = None
+        bpy.data.libraries.write(path, {coll, world}, fake_user=True, relative_remap=True)
+    finally:
+        parent2.parent = last_parent
+        bpy_collections().remove(coll)
+        bpy.data.worlds.remove(world)
+    return path
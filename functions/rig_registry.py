@@ -0,0 +1,218 @@
+# Copyright (C) 2019 Christopher Gearhart
+# chris@bblanimation.com
+# http://bblanimation.com/
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# System imports
+import re
+import uuid
+
+# Blender imports
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Object
+
+# Addon imports
+from .common import *
+
+
+REGISTRY_COLLECTION_NAME = "Default Scene"
+# custom ID properties identifying rig members (survive renames, unlike object names)
+RIG_ID_PROP = "ds_rig_id"
+RIG_ROLE_PROP = "ds_rig_role"
+PARENT_ROLES = ("parent_1", "parent_2")
+CAMERA_ROLE = "camera"
+# names of untagged rig members created before the registry existed (rig id '')
+LEGACY_NAME_PATTERN = re.compile(r"Default_Scene_(parent_\d+|emitter_\d+|camera_object)$")
+
+# (rig id, role) -> object, rebuilt lazily after invalidation
+_rig_handles = None
+# len(bpy.data.objects) when handle table was built
+_rig_handles_count = -1
+
+
+def getLightRole(i:int):
+    """ get registry role of i-th (0-based) rig light """
+    return "emitter_%d" % (i + 1)
+
+
+def getRigID(scn=None):
+    """ get id of rig belonging to scene ('' if no rig was set up) """
+    scn = scn or bpy.context.scene
+    return scn.ds_rig_id
+
+
+def ensureRigID(scn=None):
+    """ get id of rig belonging to scene (assigned on first call) """
+    scn = scn or bpy.context.scene
+    if not scn.ds_rig_id:
+        scn.ds_rig_id = uuid.uuid4().hex[:12]
+    return scn.ds_rig_id
+
+
+def _isValid(id_data):
+    try:
+        id_data.name
+    except ReferenceError:
+        return False
+    return True
+
+
+def _getLegacyRole(ob:Object):
+    """ get role of untagged rig member from its name (None if object isn't one) """
+    if ob.library is not None:
+        return None
+    match = LEGACY_NAME_PATTERN.match(ob.name)
+    if match is None:
+        return None
+    return CAMERA_ROLE if match.group(1) == "camera_object" else match.group(1)
+
+
+def _buildHandleTable():
+    """ scan objects once for rig members (objects kept from the last table win over duplicates) """
+    global _rig_handles, _rig_handles_count
+    last_handles = _rig_handles or {}
+    handles = {}
+    for ob in bpy.data.objects:
+        role = ob.get(RIG_ROLE_PROP)
+        if role is None:
+            role = _getLegacyRole(ob)
+            if role is not None:
+                handles.setdefault(("", role), ob)
+            continue
+        key = (ob.get(RIG_ID_PROP, ""), role)
+        # duplicating a rig member copies its ID properties (objects are sorted by name, so originals come first)
+        if key not in handles or last_handles.get(key) == ob:
+            handles[key] = ob
+    _rig_handles = handles
+    _rig_handles_count = len(bpy.data.objects)
+    return handles
+
+
+def invalidateRigRegistry():
+    """ drop cached handle table (rebuilt on next lookup) """
+    global _rig_handles
+    _rig_handles = None
+
+
+def getRigHandles():
+    """ get (rig id, role) -> object table """
+    return _buildHandleTable() if _rig_handles is None else _rig_handles
+
+
+def _getLookupID(scn=None):
+    """ get rig id to look scene's rig members up with (None if scene has no rig) """
+    scn = scn or bpy.context.scene
+    rig_id = getRigID(scn)
+    # files set up before the registry existed have a rig made of untagged members
+    if not rig_id and not scn.ds_scene_created:
+        return None
+    return rig_id
+
+
+def getRigObject(role:str, scn=None):
+    """ get rig member with role for scene's rig (None if missing) """
+    rig_id = _getLookupID(scn)
+    if rig_id is None:
+        return None
+    ob = getRigHandles().get((rig_id, role))
+    if ob is not None and not _isValid(ob):
+        ob = _buildHandleTable().get((rig_id, role))
+    return ob
+
+
+def getRigMembers(scn=None):
+    """ get role -> object dict of all members of scene's rig """
+    rig_id = _getLookupID(scn)
+    if rig_id is None:
+        return {}
+    members = {role:ob for (id, role), ob in getRigHandles().items() if id == rig_id}
+    if not all(_isValid(ob) for ob in members.values()):
+        members = {role:ob for (id, role), ob in _buildHandleTable().items() if id == rig_id}
+    return members
+
+
+def getRigCollection(scn=None, create:bool=False):
+    """ get collection holding scene's rig members (created and linked to the scene if 'create') """
+    scn = scn or bpy.context.scene
+    rig_id = ensureRigID(scn) if create else getRigID(scn)
+    for coll in bpy_collections():
+        if coll.get(RIG_ID_PROP) == rig_id and coll.library is None:
+            break
+    else:
+        if not create or not rig_id:
+            return None
+        coll = bpy_collections().new(REGISTRY_COLLECTION_NAME)
+        coll[RIG_ID_PROP] = rig_id
+    if b280() and coll.name not in scn.collection.children:
+        scn.collection.children.link(coll)
+    return coll
+
+
+def registerRigObject(ob:Object, role:str, scn=None):
+    """ tag object as rig member with role (replaces the previous member with that role) """
+    rig_id = ensureRigID(scn)
+    if ob.get(RIG_ID_PROP) != rig_id: ob[RIG_ID_PROP] = rig_id
+    if ob.get(RIG_ROLE_PROP) != role: ob[RIG_ROLE_PROP] = role
+    if _rig_handles is not None:
+        _rig_handles[(rig_id, role)] = ob
+    return ob
+
+
+def unregisterRigObject(ob:Object):
+    """ remove rig member tags from object """
+    key = (ob.get(RIG_ID_PROP, ""), ob.get(RIG_ROLE_PROP))
+    if _rig_handles is not None and _rig_handles.get(key) == ob:
+        del _rig_handles[key]
+    for prop in (RIG_ID_PROP, RIG_ROLE_PROP):
+        if prop in ob:
+            del ob[prop]
+
+
+def linkRigObject(ob:Object, scn=None):
+    """ link rig member to scene through the rig collection """
+    scn = scn or bpy.context.scene
+    coll = getRigCollection(scn, create=True)
+    if ob.name not in coll.objects:
+        coll.objects.link(ob)
+    # 2.79 groups are not part of the scene
+    if not b280() and scn not in ob.users_scene:
+        link_object(ob, scn)
+
+
+@persistent
+def handle_invalidate_rig_registry(scn, depsgraph=None):
+    # object handles are only stale when objects were added, removed or moved between collections
+    if _rig_handles is None:
+        return
+    if len(bpy.data.objects) != _rig_handles_count:
+        invalidateRigRegistry()
+        return
+    # 'scene_update_post' (2.79) passes no depsgraph
+    if depsgraph is None:
+        return
+    if depsgraph.id_type_updated("COLLECTION"):
+        invalidateRigRegistry()
+
+
+@persistent
+def handle_reset_rig_registry(dummy):
+    # loading a file or undoing invalidates all object references
+    invalidateRigRegistry()
+
+
+def getRegistryUpdateHandlers():
+    """ get handler list notified after data changes (depsgraph in 2.80+) """
+    return bpy.app.handlers.depsgraph_update_post if b280() else bpy.app.handlers.scene_update_post
@@ -16,11 +16,20 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 # System imports
-from copy import deepcopy
 from mathutils import Vector
 
 # Blender imports
 import bpy
+from bpy.app.handlers import persistent
+
+
+# compiled 'navigate', 'window actions' and 'save action' keysets (frozensets)
+_keymap_cache = None
+# keyconfig names and keymap item counts the cache was compiled from
+_keymap_cache_signature = None
+_keymap_cache_owner = object()
+KEYMAP_CACHE_MAPS = ("3D View", "Screen", "Window")
+KEYMAP_CACHE_CONFIGS = ("Blender", "Blender User")
 
 
 
@@ -40,10 +49,81 @@ def kmi_details(kmi):
 
     return kmi_ftype
 
+# (modifier mask (ctrl | shift << 1 | alt << 2 | oskey << 3), event type) -> ftype
+_ftypes = {}
+
+def event_ftype(event):
+    """ same as kmi_details(event), but looked up from a table instead of building a new string """
+    key = (event.ctrl | event.shift << 1 | event.alt << 2 | event.oskey << 3, event.type)
+    ftype = _ftypes.get(key)
+    if ftype is None:
+        ftype = _ftypes[key] = kmi_details(event)
+    return ftype
+
 def strip_mods(action):
     if action is None: return None
     return action.replace('CTRL+','').replace('SHIFT+','').replace('ALT+','').replace('OSKEY+','')
 
+
+def _get_keymap(keyconfig, name):
+    if name in keyconfig.keymaps:
+        return keyconfig.keymaps[name]
+    return keyconfig.keymaps.get(bpy.app.translations.pgettext(name))
+
+
+def _keymap_signature():
+    """ cheap fingerprint of the keyconfigs (catches added/removed items the msgbus does not report) """
+    keyconfigs = bpy.context.window_manager.keyconfigs
+    signature = []
+    for keyconfig_name in KEYMAP_CACHE_CONFIGS:
+        keyconfig = keyconfigs.get(keyconfig_name)
+        if keyconfig is None:
+            signature.append(None)
+            continue
+        for map_name in KEYMAP_CACHE_MAPS:
+            keymap = _get_keymap(keyconfig, map_name)
+            signature.append(None if keymap is None else len(keymap.keymap_items))
+    return tuple(signature)
+
+
+def get_compiled_keymap():
+    """ get navigation, window and save keysets translated from the keyconfigs (compiled once until keyconfigs change) """
+    global _keymap_cache, _keymap_cache_signature
+    signature = _keymap_signature()
+    if _keymap_cache is None or signature != _keymap_cache_signature:
+        keysets = {
+            'navigate': Actions.trackpad_actions | Actions.ndof_actions,
+            'window actions': set(),
+            'save action': set(),
+        }
+        for keyconfig_name in KEYMAP_CACHE_CONFIGS:
+            Actions.load_keymap(keysets, keyconfig_name)
+        _keymap_cache = {k: frozenset(v) for k, v in keysets.items()}
+        _keymap_cache_signature = signature
+    return _keymap_cache
+
+
+def invalidate_keymap_cache(*args):
+    global _keymap_cache
+    _keymap_cache = None
+
+
+def subscribe_keymap_cache():
+    # keymap item edits and keyconfig switches do not change the signature
+    for key in (bpy.types.KeyMapItem, (bpy.types.KeyConfigurations, "active")):
+        bpy.msgbus.subscribe_rna(key=key, owner=_keymap_cache_owner, args=(), notify=invalidate_keymap_cache)
+
+
+def unsubscribe_keymap_cache():
+    bpy.msgbus.clear_by_owner(_keymap_cache_owner)
+
+
+@persistent
+def handle_subscribe_keymap_cache(dummy):
+    # msgbus subscriptions are cleared when a file is loaded
+    invalidate_keymap_cache()
+    subscribe_keymap_cache()
+
 class Actions:
     # https://docs.blender.org/api/2.79/bpy.types.KeyMapItems.html
     ndof_actions = {
@@ -64,6 +144,19 @@ class Actions:
 
     ignore_actions = {}
 
+    # event kinds dispatched by update
+    TIMER, MOUSEMOVE, TRACKPAD, NDOF, MODIFIER, MOUSEBUTTON = range(6)
+
+    wheel_actions = {
+        'WHEELUPMOUSE', 'WHEELDOWNMOUSE', 'WHEELINMOUSE', 'WHEELOUTMOUSE'
+    }
+
+    mousedown_attrs = {
+        'LEFTMOUSE': 'mousedown_left',
+        'MIDDLEMOUSE': 'mousedown_middle',
+        'RIGHTMOUSE': 'mousedown_right',
+    }
+
     timer_actions = {
         'TIMER'
     }
@@ -82,6 +175,14 @@ class Actions:
         'RIGHT_CTRL', 'RIGHT_SHIFT', 'RIGHT_ALT',
     }
 
+    # modifier event type -> (state attribute, side state attribute)
+    modifier_attrs = {
+        'OSKEY': ('oskey', None),
+        'LEFT_CTRL': ('ctrl', 'ctrl_left'), 'RIGHT_CTRL': ('ctrl', 'ctrl_right'),
+        'LEFT_SHIFT': ('shift', 'shift_left'), 'RIGHT_SHIFT': ('shift', 'shift_right'),
+        'LEFT_ALT': ('alt', 'alt_left'), 'RIGHT_ALT': ('alt', 'alt_right'),
+    }
+
     navigation_events = {
         'Rotate View': 'view3d.rotate',
         'Move View': 'view3d.move',
@@ -113,54 +214,45 @@ class Actions:
     def translate(self, text):
         return bpy.app.translations.pgettext(text)
 
-    def load_keymap(self, keyconfig_name):
+    @staticmethod
+    def load_keymap(keysets, keyconfig_name):
         if keyconfig_name not in bpy.context.window_manager.keyconfigs:
             print('No keyconfig named "%s"' % keyconfig_name)
             return
         keyconfig = bpy.context.window_manager.keyconfigs[keyconfig_name]
         def get_keymap_items(key):
-            nonlocal keyconfig
-            if key in keyconfig.keymaps:
-                keymap = keyconfig.keymaps[key]
-            else:
-                keymap = keyconfig.keymaps[translate(key)]
-            return keymap.keymap_items
-        navigation_events = self.navigation_events
+            keymap = _get_keymap(keyconfig, key)
+            return keymap.keymap_items if keymap is not None else ()
+        navigation_events = Actions.navigation_events
         #navigation_events = { self.translate(key): val for key,val in self.navigation_events.items() }
-        navigation_idnames = navigation_events.values()
+        navigation_idnames = set(navigation_events.values())
         for kmi in get_keymap_items('3D View'):
             if kmi.name not in navigation_events and kmi.idname not in navigation_idnames: continue
-            if kmi.active: self.keymap['navigate'].add(kmi_details(kmi))
-            else: self.keymap['navigate'].discard(kmi_details(kmi))
+            if kmi.active: keysets['navigate'].add(kmi_details(kmi))
+            else: keysets['navigate'].discard(kmi_details(kmi))
         for map_name in ['Screen', 'Window']:
             for kmi in get_keymap_items(map_name):
-                if kmi.idname in self.window_actions:
-                    if kmi.active: self.keymap['window actions'].add(kmi_details(kmi))
-                    else: self.keymap['window actions'].discard(kmi_details(kmi))
-                if kmi.idname in self.save_actions:
-                    if kmi.active: self.keymap['save action'].add(kmi_details(kmi))
-                    else: self.keymap['save action'].discard(kmi_details(kmi))
+                if kmi.idname in Actions.window_actions:
+                    if kmi.active: keysets['window actions'].add(kmi_details(kmi))
+                    else: keysets['window actions'].discard(kmi_details(kmi))
+                if kmi.idname in Actions.save_actions:
+                    if kmi.active: keysets['save action'].add(kmi_details(kmi))
+                    else: keysets['save action'].discard(kmi_details(kmi))
 
     def __init__(self, context, keymap):
-        self.keymap = deepcopy(keymap)
-        for k, v in self.keymap.items():
+        self.keymap = {}
+        for k, v in keymap.items():
             t = type(v)
-            if t is set: continue
-            if t is list: self.keymap[k] = set(v)
-            else: self.keymap[k] = {self.keymap[k]}
-        self.keymap['navigate'] = set()         # filled in below
-        self.keymap['window actions'] = set()   # filled in by load_keymap
-        self.keymap['save action'] = set()     # filled in by load_keymap
-
-        self.keymap['navigate'] |= Actions.trackpad_actions
-        self.keymap['navigate'] |= Actions.ndof_actions
-        self.load_keymap('Blender')
-        self.load_keymap('Blender User')
+            if t in {set, frozenset, list}: self.keymap[k] = set(v)
+            else: self.keymap[k] = {v}
+        # shared compiled keysets (never mutated)
+        self.keymap.update(get_compiled_keymap())
 
         self.context = context
         self.space = context.space_data
         self.region = context.region
-        self.size = (context.region.width,context.region.height)
+        # no region when replaying events in background mode
+        self.size = (context.region.width,context.region.height) if context.region else (0, 0)
         # self.r3d = context.space_data.region_3d
 
         self.actions_using = set()
@@ -192,6 +284,7 @@ class Actions:
         self.alt = False
         self.alt_left = False
         self.alt_right = False
+        self.oskey = False
 
         self.timer = False
         self.time_delta = 0
@@ -201,85 +294,66 @@ class Actions:
 
         self.context = context
 
-        if context.region and hasattr(context.space_data, 'region_3d'):
-            self.region = context.region
-            self.size = (context.region.width,context.region.height)
+        region = context.region
+        if region and hasattr(context.space_data, 'region_3d'):
+            self.region = region
+            self.size = (region.width,region.height)
             # self.r3d = context.space_data.region_3d
 
-        # # handle strange edge cases
-        # if not context.area:
-        #     #print('Context with no area')
-        #     #print(context)
-        #     return {'RUNNING_MODAL'}
-        # if not hasattr(context.space_data, 'region_3d'):
-        #     #print('context.space_data has no region_3d')
-        #     #print(context)
-        #     #print(context.space_data)
-        #     return {'RUNNING_MODAL'}
-
-        t,pressed = event.type, event.value=='PRESS'
+        t = event.type
+        kind = Actions.event_kinds.get(t)
 
         self.mousemove_prev = self.mousemove
-        self.timer = (t in Actions.timer_actions)
-        self.mousemove = (t in Actions.mousemove_actions)
-        self.trackpad = (t in Actions.trackpad_actions)
-        self.ndof = (t in Actions.ndof_actions)
+        self.timer = kind is Actions.TIMER
+        self.mousemove = kind is Actions.MOUSEMOVE
+        self.trackpad = kind is Actions.TRACKPAD
+        self.ndof = kind is Actions.NDOF
 
         if t in self.ignore_actions: return
 
         if print_actions:
-            if t not in {'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'TIMER'}:
+            if kind is not Actions.MOUSEMOVE and kind is not Actions.TIMER:
                 print((event.type, event.value))
 
-        if self.timer and timer is not None:
-            self.time_delta = timer.time_delta
-            self.trackpad = False
-            return
+        Actions.handlers.get(kind, Actions._update_key)(self, event, timer)
 
-        if self.mousemove:
-            self.mouse_prev = self.mouse
-            self.mouse = Vector((float(event.mouse_region_x), float(event.mouse_region_y)))
-            return
-
-        if t in self.modifier_actions:
-            if t == 'OSKEY':
-                self.oskey = pressed
-            else:
-                l = t.startswith('LEFT_')
-                if t in {'LEFT_CTRL', 'RIGHT_CTRL'}:
-                    self.ctrl = pressed
-                    if l: self.ctrl_left = pressed
-                    else: self.ctrl_right = pressed
-                if t in {'LEFT_SHIFT', 'RIGHT_SHIFT'}:
-                    self.shift = pressed
-                    if l: self.shift_left = pressed
-                    else: self.shift_right = pressed
-                if t in {'LEFT_ALT', 'RIGHT_ALT'}:
-                    self.alt = pressed
-                    if l: self.alt_left = pressed
-                    else: self.alt_right = pressed
-            return
+    def _update_timer(self, event, timer):
+        if timer is not None:
+            self.time_delta = timer.time_delta
+        self.trackpad = False
 
-        if pressed and t in {'LEFTMOUSE','MIDDLEMOUSE','RIGHTMOUSE'}:
+    def update_mouse(self, event, timer=None):
+        # reuse the two mouse vectors instead of allocating one per event
+        mouse = self.mouse_prev
+        self.mouse_prev = self.mouse
+        if mouse is None or mouse is self.mouse_prev:
+            mouse = Vector((0.0, 0.0))
+        mouse.x = event.mouse_region_x
+        mouse.y = event.mouse_region_y
+        self.mouse = mouse
+
+    def _update_modifier(self, event, timer):
+        pressed = event.value == 'PRESS'
+        attr, side_attr = Actions.modifier_attrs[event.type]
+        setattr(self, attr, pressed)
+        if side_attr is not None: setattr(self, side_attr, pressed)
+
+    def _update_mousebutton(self, event, timer):
+        if event.value == 'PRESS':
             self.mousedown = Vector((float(event.mouse_region_x), float(event.mouse_region_y)))
-            if event.type == 'LEFTMOUSE':
-                self.mousedown_left = self.mousedown
-            elif event.type == 'MIDDLEMOUSE':
-                self.mousedown_middle = self.mousedown
-            elif event.type == 'RIGHTMOUSE':
-                self.mousedown_right = self.mousedown
-
-        ftype = kmi_details(event)
-        if pressed:
-            if event.type not in self.now_pressed:
-                self.just_pressed = ftype
-            if 'WHEELUPMOUSE' in ftype or 'WHEELDOWNMOUSE' in ftype:
+            setattr(self, Actions.mousedown_attrs[event.type], self.mousedown)
+        self._update_key(event, timer)
+
+    def _update_key(self, event, timer):
+        t = event.type
+        if event.value == 'PRESS':
+            ftype = event_ftype(event)
+            if t not in self.now_pressed or t in Actions.wheel_actions:
                 # mouse wheel actions have no release, so handle specially
                 self.just_pressed = ftype
-            self.now_pressed[event.type] = ftype
-        else:
-            if event.type in self.now_pressed:
-                del self.now_pressed[event.type]
+            self.now_pressed[t] = ftype
+        elif t in self.now_pressed:
+            del self.now_pressed[t]
 
     def convert(self, actions):
         t = type(actions)
@@ -312,11 +386,9 @@ class Actions:
 
     def navigating(self):
         if self.alt: return False
-        actions = self.convert('navigate')
         if self.trackpad: return True
         if self.ndof: return True
-        if any(p in actions for p in self.now_pressed.values()): return True
-        return False
+        return not self.keymap['navigate'].isdisjoint(self.now_pressed.values())
 
     def pressed(self, actions, unpress=True, ignoremods=False):
         if actions is None: return False
@@ -340,3 +412,20 @@ class Actions:
         mx,my = self.mouse
         sx,sy = self.size
         return mx >= 0 and my >= 0 and mx < sx and my < sy
+
+
+# event type -> kind (event types without a kind are handled as key presses)
+Actions.event_kinds = {
+    t: kind
+    for kind, event_types in ((Actions.TIMER, Actions.timer_actions), (Actions.MOUSEMOVE, Actions.mousemove_actions),
+                              (Actions.TRACKPAD, Actions.trackpad_actions), (Actions.NDOF, Actions.ndof_actions),
+                              (Actions.MODIFIER, Actions.modifier_actions), (Actions.MOUSEBUTTON, Actions.mousedown_attrs))
+    for t in event_types
+}
+# kind -> update method (trackpad and ndof events are also key presses)
+Actions.handlers = {
+    Actions.TIMER: Actions._update_timer,
+    Actions.MOUSEMOVE: Actions.update_mouse,
+    Actions.MODIFIER: Actions._update_modifier,
+    Actions.MOUSEBUTTON: Actions._update_mousebutton,
+}
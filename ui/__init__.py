@@ -15,6 +15,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+# System imports
+import os
+
 # Blender imports
 import bpy
 from bpy.props import *
@@ -22,6 +25,9 @@ from bpy.types import Panel
 
 # Addon imports
 from ..functions.common import *
+from ..functions.hdri import getHDRIMemory, resolveHDRIResolution
+from ..functions.rig_library import getRigLibraryPath
+from ..functions.rig_registry import getRigObject, PARENT_ROLES
 
 
 class SCENE_PT_default_scene(Panel):
@@ -53,14 +59,32 @@ class SCENE_PT_default_scene(Panel):
         else:
             row.operator("scene.position_default_camera", icon="CAMERA_DATA")
             row = col.row(align=True)
+            row.operator("scene.frame_default_camera", icon="ZOOM_SELECTED")
+            row.prop(scn, "ds_frame_fraction", text="Fill")
+            row = col.row(align=True)
             row.operator("scene.delete_default_scene", icon="CANCEL")
 
         col = layout.column(align=True)
         row = col.row(align=True)
+        row.prop(scn, "ds_rig_source", expand=True)
+        if scn.ds_rig_source == "BUILD":
+            row = col.row(align=True)
+            row.prop(scn, "ds_rig_preset", text="Preset")
+        elif not os.path.exists(getRigLibraryPath()):
+            # the library is created from a built rig
+            col.label(text="No rig library saved yet, building rig instead", icon="ERROR")
+        if scn.ds_scene_created:
+            row = col.row(align=True)
+            row.operator("scene.save_rig_library", icon="FILE_BLEND")
+        row = col.row(align=True)
         row.prop(scn, "ds_include_camera")
+        row = col.row(align=True)
+        row.prop(scn, "ds_navigation_quality")
+        if scn.ds_navigation_quality:
+            row.prop(scn, "ds_navigation_samples", text="Samples")
 
-        parent1 = bpy.data.objects.get('Default_Scene_parent_1')
-        parent2 = bpy.data.objects.get('Default_Scene_parent_2')
+        parent1 = getRigObject(PARENT_ROLES[0], scn)
+        parent2 = getRigObject(PARENT_ROLES[1], scn)
 
         col = layout.column(align=True)
         row = col.row(align=True)
@@ -84,3 +108,13 @@ class SCENE_PT_default_scene(Panel):
         row.label(text="HDRI Resolution:")
         row = col.row(align=True)
         row.column().prop(scn, "hdri_resolution", text="")
+        if scn.hdri_resolution == "AUTO":
+            row.label(text=resolveHDRIResolution(scn))
+        row = col.row(align=True)
+        row.prop(scn, "ds_progressive_hdri")
+        row = col.row(align=True)
+        row.prop(scn, "ds_hdri_filter", expand=True)
+        row = col.row(align=True)
+        row.prop(scn, "ds_hdri_memory_budget", text="Budget (MB)")
+        row = col.row(align=True)
+        row.label(text="HDRI Memory: %(mem).1f MB" % {"mem":getHDRIMemory() / 1024 ** 2})